@@ -7,4 +7,57 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 GLPI_URL = os.getenv("GLPI_URL")
 GLPI_APP_TOKEN = os.getenv("GLPI_APP_TOKEN")
-GLPI_USER_TOKEN = os.getenv("GLPI_USER_TOKEN")
\ No newline at end of file
+GLPI_USER_TOKEN = os.getenv("GLPI_USER_TOKEN")
+GLPI_VERIFY_CERTS = os.getenv("GLPI_VERIFY_CERTS", "true").lower() in ("1", "true", "yes")
+GLPI_POOL_SIZE = int(os.getenv("GLPI_POOL_SIZE", "4"))
+GLPI_CONNECT_TIMEOUT = float(os.getenv("GLPI_CONNECT_TIMEOUT", "5"))
+GLPI_READ_TIMEOUT = float(os.getenv("GLPI_READ_TIMEOUT", "20"))
+GLPI_UPLOAD_TIMEOUT = float(os.getenv("GLPI_UPLOAD_TIMEOUT", "120"))
+GLPI_MAX_RETRIES = int(os.getenv("GLPI_MAX_RETRIES", "2"))
+GLPI_SEARCH_OPTIONS_CACHE = os.getenv("GLPI_SEARCH_OPTIONS_CACHE")
+GLPI_SEARCH_OPTIONS_TTL = int(os.getenv("GLPI_SEARCH_OPTIONS_TTL", "86400"))
+GLPI_DROPDOWN_TTL = int(os.getenv("GLPI_DROPDOWN_TTL", "3600"))
+TICKET_BATCH_WINDOW = float(os.getenv("TICKET_BATCH_WINDOW", "0.2"))
+TICKET_BATCH_MAX = int(os.getenv("TICKET_BATCH_MAX", "20"))
+TICKET_CACHE_FRESH = float(os.getenv("TICKET_CACHE_FRESH", "15"))
+TICKET_CACHE_TTL = float(os.getenv("TICKET_CACHE_TTL", "600"))
+TICKET_CACHE_NEGATIVE_TTL = float(os.getenv("TICKET_CACHE_NEGATIVE_TTL", "30"))
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "2"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "10"))
+THROTTLE_SEARCH_RATE = float(os.getenv("THROTTLE_SEARCH_RATE", "0.5"))
+THROTTLE_SEARCH_BURST = int(os.getenv("THROTTLE_SEARCH_BURST", "5"))
+THROTTLE_STATUS_RATE = float(os.getenv("THROTTLE_STATUS_RATE", "0.2"))
+THROTTLE_STATUS_BURST = int(os.getenv("THROTTLE_STATUS_BURST", "5"))
+THROTTLE_CLAIM_RATE = float(os.getenv("THROTTLE_CLAIM_RATE", "0.1"))
+THROTTLE_CLAIM_BURST = int(os.getenv("THROTTLE_CLAIM_BURST", "3"))
+THROTTLE_GLPI_CONCURRENCY = int(os.getenv("THROTTLE_GLPI_CONCURRENCY", "8"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "120"))
+REFERENCE_SOURCE = os.getenv("REFERENCE_SOURCE", "file").lower()
+REFERENCE_REFRESH_INTERVAL = float(os.getenv("REFERENCE_REFRESH_INTERVAL", "900"))
+REFERENCE_TRAIN_ITEMTYPE = os.getenv("REFERENCE_TRAIN_ITEMTYPE", "Location")
+REFERENCE_TRAIN_FIELD = os.getenv("REFERENCE_TRAIN_FIELD", "name")
+REFERENCE_WAGON_ITEMTYPE = os.getenv("REFERENCE_WAGON_ITEMTYPE", "Computer")
+REFERENCE_WAGON_INACTIVE_STATES = [
+    state.strip() for state in os.getenv("REFERENCE_WAGON_INACTIVE_STATES", "Списан,Выведен из эксплуатации").split(",")
+    if state.strip()
+]
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_REGISTER = os.getenv("WEBHOOK_REGISTER", "true").lower() in ("1", "true", "yes")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "32"))
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "256"))
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite").lower()
+FSM_SQLITE_PATH = os.getenv(
+    "FSM_SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "files", "fsm.sqlite3")
+)
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "4096"))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.05"))
+STATIC_ASSETS_CACHE = os.getenv(
+    "STATIC_ASSETS_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "files", "static_assets.json")
+)
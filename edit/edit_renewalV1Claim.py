@@ -8,7 +8,8 @@ from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKe
 
 from handlers.renewalV1_handler import show_renewal_train_page
 from states.renewal_states import ClaimRenewal
-from utils.helpers import load_train_list, is_wagon_sn_valid
+from utils.helpers import is_wagon_sn_valid
+from utils.train_catalog import get_train_catalog
 from utils.renewal_utils import show_renewal_summary
 
 logger = logging.getLogger(__name__)
@@ -89,9 +90,9 @@ async def start_editing_field(callback: CallbackQuery, state: FSMContext):
     # === Для каждого поля — свой переход ===
     data = await state.get_data()
     if field_name == "train_number":
-        trains = data.get("trains", []) or load_train_list()
         page = data.get("page", 0)
-        await state.update_data(trains=trains, page=page)
+        catalog_version = data.get("catalog_version") or get_train_catalog().version
+        await state.update_data(catalog_version=catalog_version, page=page)
         await show_renewal_train_page(callback.message, state, page=page)
     elif field_name == "location":
         locations_kb = InlineKeyboardMarkup(inline_keyboard=[
@@ -135,8 +136,8 @@ async def handle_edited_field(message: Message, state: FSMContext):
     value = message.text.strip()
 
     # Проверки
-    if field_to_edit == "wagon_sn" and len(value) < 6 or not is_wagon_sn_valid(value):
-        await message.answer("❌ Вагон с таким серийным номером не найден в базе.")
+    if field_to_edit == "wagon_sn" and (len(value) < 6 or not await is_wagon_sn_valid(value)):
+        await message.answer("❌ Вагон с таким серийным номером не найден в базе или не активен.")
         return
     elif field_to_edit == "time" and not re.match(r"^([01]\d|2[0-3]):[0-5]\d$", value):
         await message.answer("❌ Неверный формат времени. Используйте чч:мм")
@@ -202,12 +203,10 @@ async def open_renewal_search_train(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(ClaimRenewal.train_search, ClaimRenewal.editing)
+@router.message(ClaimRenewal.train_search, ClaimRenewal.editing, flags={"throttle": "search"})
 async def search_edited_train(message: Message, state: FSMContext):
-    query = message.text.strip().upper()
-    data = await state.get_data()
-    all_trains = data.get("trains", []) or load_train_list()
-    results = [t for t in all_trains if t.upper().startswith(query)]
+    query = message.text.strip()
+    results = get_train_catalog().search(query, limit=10)
 
     if not results:
         await message.answer("❌ По вашему запросу поездов не найдено.")
@@ -215,7 +214,7 @@ async def search_edited_train(message: Message, state: FSMContext):
 
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=f"🚆 Поезд №{train}", callback_data=f"{CALLBACK_RENEWAL_TRAIN_SELECT}{train}")]
-        for train in results[:10]
+        for train in results
     ])
 
     await message.answer("Выберите поезд из результатов поиска:", reply_markup=kb)
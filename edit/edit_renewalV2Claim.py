@@ -8,7 +8,7 @@ from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKe
 
 from handlers.renewalV2_handler import show_renewal_train_page, CALLBACK_RENEWAL_V2_TRAIN_SELECT
 from states.renewal_states import ClaimRenewalV2
-from utils.helpers import load_train_list
+from utils.train_catalog import get_train_catalog
 from utils.renewal_utils import show_renewal_summary_v2
 
 logger = logging.getLogger(__name__)
@@ -87,10 +87,14 @@ async def start_editing_field(callback: CallbackQuery, state: FSMContext):
     # === Для каждого поля — свой переход ===
     data = await state.get_data()
     if field_name == "train_number":
-        trains = data.get("trains", []) or load_train_list()
         page = data.get("page", 0)
-        await state.update_data(trains=trains, page=page)
+        catalog_version = data.get("catalog_version") or get_train_catalog().version
+        await state.update_data(catalog_version=catalog_version, page=page)
         await show_renewal_train_page(callback.message, state, page=page)
+    elif field_name == "wagon_count":
+        # Количество проверяется вместе со списком номеров вагонов (renewal_wagon_count)
+        await state.set_state(ClaimRenewalV2.wagon_count)
+        await callback.message.answer(prompt)
     elif field_name == "location":
         locations_kb = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text=loc, callback_data=key)] for key, loc in LOCATIONS.items()
@@ -200,12 +204,10 @@ async def open_renewal_search_train(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(ClaimRenewalV2.train_search, ClaimRenewalV2.editing)
+@router.message(ClaimRenewalV2.train_search, ClaimRenewalV2.editing, flags={"throttle": "search"})
 async def search_edited_train(message: Message, state: FSMContext):
-    query = message.text.strip().upper()
-    data = await state.get_data()
-    all_trains = data.get("trains", []) or load_train_list()
-    results = [t for t in all_trains if t.upper().startswith(query)]
+    query = message.text.strip()
+    results = get_train_catalog().search(query, limit=10)
 
     if not results:
         await message.answer("❌ По вашему запросу поездов не найдено.")
@@ -213,7 +215,7 @@ async def search_edited_train(message: Message, state: FSMContext):
 
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=f"🚆 Поезд №{train}", callback_data=f"{CALLBACK_RENEWAL_V2_TRAIN_SELECT}{train}")]
-        for train in results[:10]
+        for train in results
     ])
 
     await message.answer("Выберите поезд из результатов поиска:", reply_markup=kb)
@@ -7,16 +7,26 @@ provided by the API and manage HTTP return codes.
 from __future__ import unicode_literals
 import re
 import os
+import io
 import sys
+import json
+import time
+import random
+import asyncio
+import threading
 import warnings
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 from functools import wraps
 from base64 import b64encode
-from contextlib import contextmanager
-import requests
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
 
-_UPLOAD_MANIFEST = '{{ "input": {{ "name": "{name:s}", "_filename" : ["{filename:s}"] }} }}'
-"""Manifest when uploading a document passed as JSON in the multipart/form-data POST
-request. Note the double curly is used for representing only one curly."""
+def _upload_manifest(name, filename):
+    """Manifest when uploading a document passed as JSON in the multipart/form-data POST
+    request. Values are JSON encoded so user provided file names can't break it."""
+    return json.dumps({'input': {'name': name, '_filename': [filename]}})
 
 _WARN_DEL_DOC = (
     "The file could not be uploaded but a document with id '{:d}' was created, "
@@ -28,12 +38,397 @@ _WARN_DEL_ERR = (
 """Warning when an invalid document could not be purged."""
 
 _FILENAME_RE = re.compile('^filename="(.+)";')
+_UNSATISFIED_RANGE_RE = re.compile(r'^bytes \*/(\d+)$')
+
+_CHUNK_SIZE = 64 * 1024
+"""Default size of chunks when downloading documents."""
+
+_PAGE_SIZE = 100
+"""Default number of rows by request when iterating over a collection."""
+
+_IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+"""HTTP methods which can be sent again without side effects."""
 
 class GLPIError(Exception):
     """Exception raised by this module."""
 
+class RetryBudget:
+    """Budget shared by clients for limiting retries to a ratio of requests so a
+    failing GLPI is not flooded by retries. Each request deposits ``ratio`` token
+    and each retry withdraws one; ``min_per_second`` tokens are also refilled
+    every second so retries are still possible with little traffic. Tokens are
+    capped to ``capacity``.
+    """
+    def __init__(self, ratio=0.1, min_per_second=1.0, capacity=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Called for each new request."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Return whether a retry is allowed (and consume a token if so)."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                self.exhausted += 1
+                return False
+            self._tokens -= 1
+            self.retries += 1
+            return True
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+"""Retry budget shared by all policies not defining their own."""
+
+class RequestPolicy:
+    """Timeouts and retries applied to every request sent by :class:`GLPI` and
+    :class:`AsyncGLPI` (``policy`` parameter):
+
+    .. code::
+
+        >>> policy = RequestPolicy(connect_timeout=3, read_timeout=10,
+                                   timeouts={'Document': (3, 120)},
+                                   max_retries=2)
+        >>> with glpi_api.connect(URL, APPTOKEN, USERTOKEN, policy=policy) as glpi:
+        >>>     ...
+
+    ``timeouts`` overrides the ``(connect, read)`` timeouts (in seconds) for an
+    endpoint, which is the first part of the API path (``'Ticket'`` for
+    ``Ticket/1``, ``'search'``, ``'initSession'``, ...).
+
+    Requests failing to connect, and idempotent requests (``GET``) failing with
+    a timeout, a connection error or a 429/502/503/504 status, are retried at
+    most ``max_retries`` times after an exponential backoff with full jitter
+    (``backoff_base * 2 ** attempt`` capped to ``backoff_max``). Other requests
+    are only retried on 429, or 503 with a ``Retry-After`` header, as GLPI did
+    not process them. ``Retry-After`` is honoured, up to ``retry_after_max``
+    seconds. Retries are withdrawn from ``budget`` (:data:`DEFAULT_RETRY_BUDGET`
+    by default) and no more retries are done when it is exhausted. Requests with
+    a body which can't be sent twice (files, streams) are never retried.
+    """
+    def __init__(self, connect_timeout=5.0, read_timeout=30.0, timeouts=None,
+                 max_retries=2, backoff_base=0.2, backoff_max=5.0, retry_after_max=30.0,
+                 retry_statuses=(429, 502, 503, 504), budget=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.timeouts = dict(timeouts or {})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget if budget is not None else DEFAULT_RETRY_BUDGET
+
+    def timeout(self, endpoint):
+        """Return ``(connect, read)`` timeouts for ``endpoint``."""
+        return self.timeouts.get(endpoint, (self.connect_timeout, self.read_timeout))
+
+    def should_retry(self, method, attempt, status=None, headers=None, connected=True):
+        """Whether a request sent ``attempt + 1`` times should be sent again. For
+        transport errors ``status`` is *None* and ``connected`` indicates whether
+        the connection was established (so the request may have been received).
+        """
+        if attempt >= self.max_retries:
+            return False
+        idempotent = method.upper() in _IDEMPOTENT_METHODS
+        if status is None:
+            retry = idempotent or not connected
+        elif status == 429:
+            retry = True
+        elif status not in self.retry_statuses:
+            retry = False
+        else:
+            retry = idempotent or (status == 503 and 'Retry-After' in (headers or {}))
+        return retry and self.budget.withdraw()
+
+    def delay(self, attempt, headers=None):
+        """Return the number of seconds to wait before sending again a request
+        which failed ``attempt + 1`` times."""
+        retry_after = _parse_retry_after((headers or {}).get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, self.retry_after_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+DEFAULT_POLICY = RequestPolicy()
+"""Policy used by clients when no policy is given."""
+
+class FieldMap:
+    """Forward (uid to id) and reverse (id to uid) maps of the search options of
+    an itemtype. Ids are strings."""
+    __slots__ = ('ids', 'uids', 'created')
+
+    def __init__(self, ids, created=None):
+        self.ids = {str(uid): str(field_id) for uid, field_id in ids.items()}
+        self.uids = {field_id: uid for uid, field_id in self.ids.items()}
+        self.created = time.time() if created is None else created
+
+class SearchOptionsCache:
+    """Cache of the search options maps (see :class:`FieldMap`) keyed by GLPI URL
+    and itemtype, shared by all clients so ``listSearchOptions`` is retrieved
+    once per itemtype instead of once per session:
+
+    .. code::
+
+        >>> cache = SearchOptionsCache(ttl=3600, path='/var/cache/bot/searchoptions.json')
+        >>> glpi = GLPI(URL, APPTOKEN, USERTOKEN, search_options=cache)
+
+    Entries expire after ``ttl`` seconds (never if *None*). When ``path`` is set,
+    entries are persisted in this JSON file and loaded from it, except if they
+    were saved with another ``version`` (for example the GLPI version, for
+    invalidating entries on upgrades).
+    """
+    def __init__(self, ttl=86400, path=None, version=None):
+        self.ttl = ttl
+        self.path = path
+        self.version = version
+        self._maps = {}
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    @staticmethod
+    def _key(url, itemtype):
+        return '{:s}|{:s}'.format(url.strip('/'), itemtype)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as fhandler:
+                content = json.load(fhandler)
+        except (OSError, ValueError):
+            return
+        if content.get('version') != self.version:
+            return
+        for key, entry in content.get('maps', {}).items():
+            self._maps[key] = FieldMap(entry['ids'], entry['created'])
+
+    def _save(self):
+        content = {
+            'version': self.version,
+            'maps': {key: {'ids': fields.ids, 'created': fields.created}
+                     for key, fields in self._maps.items()}
+        }
+        tmp_path = '{:s}.tmp'.format(self.path)
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as fhandler:
+                json.dump(content, fhandler, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            warnings.warn('unable to save search options cache: {:s}'.format(str(err)),
+                          UserWarning)
+
+    def get(self, url, itemtype):
+        """Return the :class:`FieldMap` of ``itemtype``, *None* if it is not
+        cached or has expired."""
+        fields = self._maps.get(self._key(url, itemtype))
+        if fields is None:
+            return None
+        if self.ttl is not None and time.time() - fields.created > self.ttl:
+            return None
+        return fields
+
+    def set(self, url, itemtype, ids):
+        """Cache the uid to id map ``ids`` of ``itemtype`` and return the
+        corresponding :class:`FieldMap`."""
+        fields = FieldMap(ids)
+        with self._lock:
+            self._maps[self._key(url, itemtype)] = fields
+            if self.path:
+                self._save()
+        return fields
+
+    def invalidate(self, url=None, itemtype=None):
+        """Remove entries of ``url`` and/or ``itemtype`` (all if not set)."""
+        with self._lock:
+            for key in list(self._maps):
+                key_url, key_itemtype = key.rsplit('|', 1)
+                if ((url is None or key_url == url.strip('/'))
+                        and (itemtype is None or key_itemtype == itemtype)):
+                    del self._maps[key]
+            if self.path:
+                self._save()
+
+SEARCH_OPTIONS_CACHE = SearchOptionsCache()
+"""Search options cache used by clients when no cache is given."""
+
+def dropdown_name(itemtype, item):
+    """Return the name displayed for the dropdown ``item`` of type ``itemtype``:
+    the full name of users, the complete name (with parents) of tree dropdowns
+    (entities, categories, ...) and the name otherwise."""
+    if itemtype == 'User':
+        fullname = ' '.join(item[key] for key in ('realname', 'firstname') if item.get(key))
+        return fullname or item.get('name')
+    return item.get('completename') or item.get('name')
+
+class DropdownCache:
+    """Cache of dropdowns names (categories, entities, users, request types, ...)
+    keyed by GLPI URL, itemtype and id, shared by all clients so foreign keys of
+    items (``itilcategories_id``, ``entities_id``, ...) are resolved without a
+    request per id (see :meth:`GLPI.resolve_dropdowns`):
+
+    .. code::
+
+        >>> cache = DropdownCache(ttl=3600)
+        >>> glpi = GLPI(URL, APPTOKEN, USERTOKEN, dropdowns=cache)
+        >>> glpi.warm_dropdowns('ITILCategory', 'Entity')
+
+    Entries expire after ``ttl`` seconds (never if *None*). Unknown ids are cached
+    too (with a *None* name) so they are not requested again until they expire.
+    """
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._names = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url, itemtype, item_id):
+        return (url.strip('/'), itemtype, int(item_id))
+
+    def get(self, url, itemtype, item_id, default=None):
+        """Return the name of the dropdown ``item_id`` of type ``itemtype``,
+        ``default`` if it is not cached or has expired."""
+        entry = self._names.get(self._key(url, itemtype, item_id))
+        if entry is None:
+            return default
+        name, created = entry
+        if self.ttl is not None and time.time() - created > self.ttl:
+            return default
+        return name
+
+    def missing(self, url, refs):
+        """Return the ``(itemtype, id)`` references of ``refs`` which are not
+        cached (or have expired), without duplicates."""
+        unknown = object()
+        return list(dict.fromkeys(
+            (itemtype, int(item_id)) for itemtype, item_id in refs
+            if self.get(url, itemtype, item_id, unknown) is unknown))
+
+    def set(self, url, itemtype, item_id, name):
+        """Cache the ``name`` of the dropdown ``item_id`` of type ``itemtype``."""
+        with self._lock:
+            self._names[self._key(url, itemtype, item_id)] = (name, time.time())
+
+    def update(self, url, itemtype, items):
+        """Cache the names of the dropdowns ``items`` (rows of ``itemtype``)."""
+        created = time.time()
+        with self._lock:
+            for item in items:
+                self._names[self._key(url, itemtype, item['id'])] = (
+                    dropdown_name(itemtype, item), created)
+
+    def invalidate(self, url=None, itemtype=None):
+        """Remove entries of ``url`` and/or ``itemtype`` (all if not set)."""
+        with self._lock:
+            for key in list(self._names):
+                if ((url is None or key[0] == url.strip('/'))
+                        and (itemtype is None or key[1] == itemtype)):
+                    del self._names[key]
+
+DROPDOWN_CACHE = DropdownCache()
+"""Dropdowns names cache used by clients when no cache is given."""
+
+def _dropdown_refs(refs):
+    """Return the references of ``refs`` that can be resolved: ids 0 mean "no
+    value" in GLPI, except for the root entity."""
+    return [(itemtype, int(item_id)) for itemtype, item_id in refs
+            if item_id is not None and (int(item_id) or itemtype == 'Entity')]
+
+def _store_dropdowns(cache, url, refs, items):
+    """Cache the names of the ``items`` returned by ``getMultipleItems`` for
+    ``refs`` (in the same order), errors being cached as unknown ids."""
+    for (itemtype, item_id), item in zip(refs, items):
+        name = dropdown_name(itemtype, item) if isinstance(item, dict) else None
+        cache.set(url, itemtype, item_id, name)
+
+def _parse_retry_after(value):
+    """Return the delay in seconds of a ``Retry-After`` header (number of seconds
+    or HTTP date), *None* if it is not set or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+def _endpoint(url, base_url):
+    """Return the API endpoint (first part of the path) of ``url``."""
+    path = url[len(base_url.strip('/')):] if url.startswith(base_url.strip('/')) else url
+    return path.strip('/').split('/', 1)[0].split('?', 1)[0]
+
+_AIOHTTP_CONNECT_ERRORS = tuple(
+    getattr(aiohttp, name) for name in ('ClientConnectorError', 'ConnectionTimeoutError')
+    if hasattr(aiohttp, name))
+"""``aiohttp`` errors raised when the connection could not be established."""
+
+_POLICY_SESSION = None
+"""``requests`` session class, defined on first use (see :func:`_policy_session`)."""
+
+def _policy_session(policy, base_url):
+    """Return a ``requests`` session applying ``policy``. ``requests`` is only
+    imported by the synchronous client, so importing this module for
+    :class:`AsyncGLPI` does not pay for it."""
+    global _POLICY_SESSION
+    if _POLICY_SESSION is None:
+        import requests
+
+        class _PolicySession(requests.Session):
+            """``requests`` session applying a :class:`RequestPolicy` to all requests."""
+            def __init__(self, policy, base_url):
+                super().__init__()
+                self.policy = policy
+                self.base_url = base_url
+
+            def request(self, method, url, *args, **kwargs):
+                kwargs.setdefault('timeout', self.policy.timeout(_endpoint(url, self.base_url)))
+                # Bodies from files or streams can't be sent twice.
+                replayable = 'files' not in kwargs and not hasattr(kwargs.get('data'), 'read')
+                self.policy.budget.deposit()
+                attempt = 0
+                while True:
+                    try:
+                        response = super().request(method, url, *args, **kwargs)
+                    except requests.exceptions.RequestException as err:
+                        connected = not isinstance(err, requests.exceptions.ConnectTimeout)
+                        if not (replayable and self.policy.should_retry(method, attempt,
+                                                                        connected=connected)):
+                            raise
+                        time.sleep(self.policy.delay(attempt))
+                    else:
+                        if not (replayable and self.policy.should_retry(method, attempt,
+                                                                        response.status_code,
+                                                                        response.headers)):
+                            return response
+                        time.sleep(self.policy.delay(attempt, response.headers))
+                        response.close()
+                    attempt += 1
+
+        _POLICY_SESSION = _PolicySession
+    return _POLICY_SESSION(policy, base_url)
+
 @contextmanager
-def connect(url, apptoken, auth, verify_certs=True, use_headers=True, user_agent=None):
+def connect(url, apptoken, auth, verify_certs=True, use_headers=True, user_agent=None,
+            policy=None, search_options=None, dropdowns=None):
     """Context manager that authenticate to GLPI when enter and kill application
     session in GLPI when leaving:
 
@@ -58,13 +453,49 @@ def connect(url, apptoken, auth, verify_certs=True, use_headers=True, user_agent
     some environments (cf `this GLPI issue
     <https://github.com/glpi-project/glpi/issues/5116#issuecomment-496166674>`_ and
     the following Stack Overflow post) may require to use GET parameters.
+
+    ``policy`` is the :class:`RequestPolicy` (timeouts and retries) applied to
+    requests, :data:`DEFAULT_POLICY` is used if not set. ``search_options`` is the
+    :class:`SearchOptionsCache` used for fields ids (:data:`SEARCH_OPTIONS_CACHE`
+    if not set) and ``dropdowns`` the :class:`DropdownCache` used for dropdowns
+    names (:data:`DROPDOWN_CACHE` if not set).
     """
-    glpi = GLPI(url, apptoken, auth, verify_certs, use_headers=use_headers)
+    glpi = GLPI(url, apptoken, auth, verify_certs, use_headers=use_headers, policy=policy,
+                search_options=search_options, dropdowns=dropdowns)
     try:
         yield glpi
     finally:
         glpi.kill_session()
 
+@asynccontextmanager
+async def aconnect(url, apptoken, auth, verify_certs=True, use_headers=True, user_agent=None,
+                   policy=None, search_options=None, dropdowns=None):
+    """Asynchronous counterpart of :func:`connect` which yields an :class:`AsyncGLPI`
+    instance. The session is initialized when entering and killed when leaving:
+
+    .. code::
+
+        >>> import glpi_api
+        >>>
+        >>> async with glpi_api.aconnect(URL, APPTOKEN, USERTOKEN) as glpi:
+        >>>     print(await glpi.get_config())
+    """
+    glpi = AsyncGLPI(url, apptoken, auth, verify_certs, use_headers=use_headers,
+                     user_agent=user_agent, policy=policy, search_options=search_options,
+                     dropdowns=dropdowns)
+    try:
+        await glpi.init_session()
+    except BaseException:
+        await glpi.close()
+        raise
+    try:
+        yield glpi
+    finally:
+        try:
+            await glpi.kill_session()
+        finally:
+            await glpi.close()
+
 def _raise(msg):
     """Raise ``GLPIError`` exception with ``msg`` message.
 
@@ -93,17 +524,119 @@ def _convert_bools(kwargs):
     return {key: str(val).lower() if isinstance(val, bool) else val
             for key, val in kwargs.items()}
 
+def _searchtext_params(searchText):
+    """Generate searchText parameter."""
+    if not isinstance(searchText, dict):
+        raise GLPIError(
+            'search text should be a dict, found: {:s}'.format(str(type(searchText)))
+        )
+
+    return {'searchText[{:s}]'.format(k): v for k, v in searchText.items()}
+
+def _page_range(start, page_size):
+    """Return the ``range`` parameter for the page beginning at row ``start``."""
+    return '{:d}-{:d}'.format(start, start + page_size - 1)
+
+def _page_total(response, body):
+    """Return the total number of rows of a collection from the ``Content-Range``
+    header (``start-end/total``) or the ``totalcount`` key of a search result
+    (``None`` if unknown)."""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        try:
+            return int(content_range.rsplit('/', 1)[1])
+        except ValueError:
+            pass
+    if isinstance(body, dict) and 'totalcount' in body:
+        return int(body['totalcount'])
+    return None
+
+def _last_page(rows, start, page_size, total):
+    """Whether the page of ``rows`` beginning at row ``start`` is the last one."""
+    if not rows:
+        return True
+    if total is not None:
+        return start + page_size >= total
+    return len(rows) < page_size
+
+def _page_handler(rows):
+    """Return the status code handler of a page request returning the list of
+    rows (extracted from the body by ``rows``) and the total number of rows."""
+    def page(response):
+        body = response.json()
+        return rows(body), _page_total(response, body)
+    return {
+        200: page,
+        206: page,
+        400: _glpi_error,
+        401: _glpi_error
+    }
+
 def _catch_errors(func):
     """Decorator function for catching communication error
     and raising an exception."""
     @wraps(func)
     def wrapper(self, *args, **kwargs):
+        import requests
         try:
             return func(self, *args, **kwargs)
         except requests.exceptions.RequestException as err:
             raise GLPIError('communication error: {:s}'.format(str(err)))
     return wrapper
 
+def _acatch_errors(func):
+    """Asynchronous version of ``_catch_errors`` for ``aiohttp`` errors."""
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await func(self, *args, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise GLPIError('communication error: {:s}'.format(str(err) or repr(err)))
+    return wrapper
+
+def _range_complete(headers, offset):
+    """Whether a ``416`` answer to a request from byte ``offset`` means that the
+    file is complete, i.e. the size of the remote file given by ``Content-Range``
+    (``bytes */SIZE``) is ``offset``. A local file larger than the remote one (or
+    an unknown size) is not complete."""
+    match = _UNSATISFIED_RANGE_RE.match(headers.get('Content-Range', ''))
+    return match is not None and int(match.group(1)) == offset
+
+def _is_invalid_token(response):
+    """Whether GLPI rejected the session token of the request."""
+    if response.status_code != 401:
+        return False
+    try:
+        return response.json()[0] == 'ERROR_SESSION_TOKEN_INVALID'
+    except (ValueError, LookupError, TypeError):
+        return False
+
+def _auth_params(apptoken, auth, user_agent, use_headers):
+    """Return headers and GET parameters used for initializing a session."""
+    init_headers = {
+        'Content-Type': 'application/json',
+        'App-Token': apptoken
+    }
+    if user_agent:
+        init_headers['User-Agent'] = user_agent
+    params = {}
+
+    if isinstance(auth, (list, tuple)):
+        if len(auth) > 2:
+            raise GLPIError("invalid 'auth' parameter (should contains "
+                            'username and password)')
+        if use_headers:
+            authorization = 'Basic {:s}'.format(b64encode(':'.join(auth).encode()).decode())
+            init_headers.update(Authorization=authorization)
+        else:
+            params.update(login=auth[0], password=auth[1])
+    else:
+        if use_headers:
+            init_headers.update(Authorization='user_token {:s}'.format(auth))
+        else:
+            params.update(user_token=auth)
+    return init_headers, params
+
 class GLPI:
     """Class for interacting with GLPI using the REST API.
 
@@ -125,18 +658,23 @@ class GLPI:
 
     `verify_certs` and `use_headers` can be unset to respectively not checking
     SSL certificates and passing authentication parameters as GET parameters
-    (instead of headers).
+    (instead of headers). `policy` is the :class:`RequestPolicy` applied to
+    requests (:data:`DEFAULT_POLICY` if not set), `search_options` the
+    :class:`SearchOptionsCache` for fields ids (:data:`SEARCH_OPTIONS_CACHE` if
+    not set) and `dropdowns` the :class:`DropdownCache` for dropdowns names
+    (:data:`DROPDOWN_CACHE` if not set).
     """
     def __init__(self, url, apptoken, auth, verify_certs=True, use_headers=True,
-                 user_agent=None):
+                 user_agent=None, policy=None, search_options=None, dropdowns=None):
         """Connect to GLPI and retrieve session token which is put in a
         ``requests`` session as attribute.
         """
         self.url = url
 
         # Initialize session.
-        self.session = requests.Session()
+        self.session = _policy_session(policy or DEFAULT_POLICY, url)
         if not verify_certs:
+            import requests
             from requests.packages.urllib3.exceptions import InsecureRequestWarning
             requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
             self.session.verify = False
@@ -156,7 +694,9 @@ class GLPI:
         self.session.headers = headers
 
         # Use for caching field id/uid map.
-        self._fields = {}
+        self._fields = search_options or SEARCH_OPTIONS_CACHE
+        # Use for caching dropdowns names.
+        self._dropdowns = dropdowns or DROPDOWN_CACHE
 
     def _set_method(self, *endpoints):
         """Generate the URL from ``endpoints``."""
@@ -171,28 +711,7 @@ class GLPI:
         ``auth`` can either be a string containing the user token of a list/tuple
         of two elements containing username and password.
         """
-        init_headers = {
-            'Content-Type': 'application/json',
-            'App-Token': apptoken
-        }
-        if user_agent:
-            init_headers['User-Agent'] = user_agent
-        params = {}
-
-        if isinstance(auth, (list, tuple)):
-            if len(auth) > 2:
-                raise GLPIError("invalid 'auth' parameter (should contains "
-                                'username and password)')
-            if use_headers:
-                authorization = 'Basic {:s}'.format(b64encode(':'.join(auth).encode()).decode())
-                init_headers.update(Authorization=authorization)
-            else:
-                params.update(login=auth[0], password=auth[1])
-        else:
-            if use_headers:
-                init_headers.update(Authorization='user_token {:s}'.format(auth))
-            else:
-                params.update(user_token=auth)
+        init_headers, params = _auth_params(apptoken, auth, user_agent, use_headers)
 
         response = self.session.get(url=self._set_method('initSession'),
                                     headers=init_headers,
@@ -446,12 +965,7 @@ class GLPI:
         '''
         Generate searchText parameter.
         '''
-        if not isinstance(searchText, dict):
-            raise GLPIError(
-                'search text should be a dict, found: {:s}'.format(str(type(searchText)))
-            )
-
-        return {'searchText[{:s}]'.format(k): v for k, v in searchText.items()}
+        return _searchtext_params(searchText)
 
     @_catch_errors
     def get_all_items(self, itemtype, **kwargs):
@@ -582,10 +1096,19 @@ class GLPI:
                 for field_id, field in self.list_search_options(itemtype).items()
                 if 'uid' in field}
 
+    def _field_map(self, itemtype, refresh=False):
+        """Return the :class:`FieldMap` of ``itemtype`` from the search options
+        cache, retrieving it if needed."""
+        fields = None if refresh else self._fields.get(self.url, itemtype)
+        if fields is None:
+            fields = self._fields.set(self.url, itemtype, self._map_fields(itemtype))
+        return fields
+
     def field_id(self, itemtype, field_uid, refresh=False):
         """Return ``itemtype`` field id from ``field_uid``. Each ``itemtype``
-        are "cached" (in *_fields* attribute) and will be retrieve once except
-        if ``refresh`` is set.
+        are cached (in the shared search options cache, see
+        :class:`SearchOptionsCache`) and will be retrieve once except if
+        ``refresh`` is set.
 
         .. code::
 
@@ -596,29 +1119,59 @@ class GLPI:
         if re.match(r'^\d+$', str(field_uid)):
             return str(field_uid)
 
-        # Retrieve and cache fields for itemtype.
-        if itemtype not in self._fields or refresh:
-            self._fields[itemtype] = self._map_fields(itemtype)
-
-        return str(self._fields[itemtype][str(field_uid)])
+        return self._field_map(itemtype, refresh).ids[str(field_uid)]
 
     def field_uid(self, itemtype, field_id, refresh=False):
         """Return ``itemtype`` field uid from ``field_id``. Each ``itemtype``
-        are "cached" (in *_fields* attribute) and will be retrieve once except
-        if ``refresh`` is set.
+        are cached (in the shared search options cache, see
+        :class:`SearchOptionsCache`) and will be retrieve once except if
+        ``refresh`` is set.
 
         .. code::
 
             >>> glpi.field_id('Computer', 80)
             'Entity.completename'
         """
-        # Retrieve and store fields for itemtype.
-        if itemtype not in self._fields or refresh:
-            self._fields[itemtype] = self._map_fields(itemtype)
-        # Reverse mapping and return field uid.
-        return {value: key
-                for key, value in self._fields[itemtype].items()
-               }[str(field_id)]
+        return self._field_map(itemtype, refresh).uids[str(field_id)]
+
+    def resolve_dropdowns(self, *refs):
+        """Return the names of the dropdowns ``refs`` (``(itemtype, id)`` pairs)
+        as a dict keyed by the references (with integer ids). Names come from
+        the dropdowns cache (see :class:`DropdownCache`), missing ones are
+        retrieved with one ``getMultipleItems`` request. Unknown ids and ids 0
+        ("no value", except for the root entity) are resolved to *None*.
+
+        .. code::
+
+            >>> ticket = glpi.get_item('Ticket', 1)
+            >>> glpi.resolve_dropdowns(('ITILCategory', ticket['itilcategories_id']),
+                                       ('Entity', ticket['entities_id']))
+            {('ITILCategory', 3): 'Hardware > Printer', ('Entity', 0): 'Root entity'}
+        """
+        valid = _dropdown_refs(refs)
+        missing = self._dropdowns.missing(self.url, valid)
+        if missing:
+            items = self.get_multiple_items(
+                *({'itemtype': itemtype, 'items_id': item_id} for itemtype, item_id in missing))
+            _store_dropdowns(self._dropdowns, self.url, missing, items)
+        return {(itemtype, int(item_id)): self._dropdowns.get(self.url, itemtype, item_id)
+                for itemtype, item_id in refs if item_id is not None}
+
+    def warm_dropdowns(self, *itemtypes, page_size=_PAGE_SIZE):
+        """Load all the names of dropdowns ``itemtypes`` in the dropdowns cache
+        (see :meth:`iter_all_items`) and return the number of loaded names.
+
+        .. code::
+
+            >>> glpi.warm_dropdowns('ITILCategory', 'Entity', 'RequestType')
+            42
+        """
+        count = 0
+        for itemtype in itemtypes:
+            items = list(self.iter_all_items(itemtype, page_size=page_size))
+            self._dropdowns.update(self.url, itemtype, items)
+            count += len(items)
+        return count
 
     def _add_forcedisplay(self, itemtype, value):
         return {
@@ -667,6 +1220,21 @@ class GLPI:
 
         return params
 
+    def _search_params(self, itemtype, kwargs):
+        """Return the query parameters of a search on ``itemtype``."""
+        params = {}
+        # Format forcedisplay parameter
+        params.update(self._add_forcedisplay(itemtype, kwargs.pop('forcedisplay', [])))
+        # Add criteria and metacriteria
+        criteria = kwargs.pop('criteria', [])
+        for criterion in kwargs.pop('metacriteria', []):
+            criterion['meta'] = True
+            criteria.append(criterion)
+        params.update(self._add_criteria(criteria, itemtype))
+        # Add other parameters
+        params.update(kwargs)
+        return params
+
     @_catch_errors
     def search(self, itemtype, **kwargs):
         """`API documentation
@@ -695,18 +1263,7 @@ class GLPI:
             >>> glpi.search('Computer', criteria=criteria, forcedisplay=forcedisplay)
             [{'1': 'test', '80': 'Root entity', '45': 'Ubuntu', '46': 16.04}]
         """
-        params = {}
-        # Format forcedisplay parameter
-        params.update(self._add_forcedisplay(itemtype, kwargs.pop('forcedisplay', [])))
-        # Add criteria and metacriteria
-        criteria = kwargs.pop('criteria', [])
-        for criterion in kwargs.pop('metacriteria', []):
-            criterion['meta'] = True
-            criteria.append(criterion)
-        params.update(self._add_criteria(criteria, itemtype))
-        # Add other parameters
-        params.update(kwargs)
-
+        params = self._search_params(itemtype, kwargs)
         response = self.session.get(self._set_method('search', itemtype), params=params)
         return {
             200: lambda r: r.json().get('data', []),
@@ -715,6 +1272,67 @@ class GLPI:
             401: _glpi_error
         }.get(response.status_code, _unknown_error)(response)
 
+    @_catch_errors
+    def _get_page(self, url, params, rows, start, page_size):
+        """Return the rows of the page beginning at row ``start`` of the collection
+        at ``url`` and the total number of rows of the collection."""
+        params = dict(params, range=_page_range(start, page_size))
+        response = self.session.get(url, params=params)
+        return _page_handler(rows).get(response.status_code, _unknown_error)(response)
+
+    def _iter_pages(self, url, params, rows, page_size, prefetch):
+        """Generator over the rows of the collection at ``url`` requested by pages
+        of ``page_size`` rows. If ``prefetch`` is set, the next page is requested
+        in a background thread while the current one is consumed."""
+        def fetch(start):
+            return self._get_page(url, params, rows, start, page_size)
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            start = 0
+            pending = executor.submit(fetch, start) if prefetch else None
+            while True:
+                page, total = pending.result() if prefetch else fetch(start)
+                last = _last_page(page, start, page_size, total)
+                start += page_size
+                if prefetch and not last:
+                    pending = executor.submit(fetch, start)
+                yield from page
+                if last:
+                    return
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def iter_all_items(self, itemtype, page_size=_PAGE_SIZE, prefetch=True, **kwargs):
+        """Same as :meth:`get_all_items` but return a generator over all the rows
+        of the collection, whatever its size. Rows are requested by pages of
+        ``page_size`` rows (using the ``range`` parameter) and, unless ``prefetch``
+        is unset, the next page is requested while the current one is consumed.
+
+        .. code::
+
+            >>> for computer in glpi.iter_all_items('Computer', page_size=500):
+            >>>     print(computer['name'])
+        """
+        kwargs.update(self._add_searchtext(kwargs.pop('searchText', {})))
+        return self._iter_pages(self._set_method(itemtype), _convert_bools(kwargs),
+                                lambda body: body, page_size, prefetch)
+
+    def iter_search(self, itemtype, page_size=_PAGE_SIZE, prefetch=True, **kwargs):
+        """Same as :meth:`search` but return a generator over all the results,
+        requested by pages of ``page_size`` rows (see :meth:`iter_all_items`).
+
+        .. code::
+
+            >>> criteria = [{'field': 12, 'searchtype': 'equals', 'value': 'notold'}]
+            >>> for ticket in glpi.iter_search('Ticket', criteria=criteria):
+            >>>     print(ticket['2'])
+        """
+        params = self._search_params(itemtype, kwargs)
+        return self._iter_pages(self._set_method('search', itemtype), params,
+                                lambda body: body.get('data', []), page_size, prefetch)
+
     @_catch_errors
     def add(self, itemtype, *items):
         """`API documentation <https://github.com
@@ -910,7 +1528,7 @@ class GLPI:
                 files={
                     'uploadManifest': (
                         None,
-                        _UPLOAD_MANIFEST.format(name=name, filename=os.path.basename(filepath)),
+                        _upload_manifest(name, os.path.basename(filepath)),
                         'application/json'
                     ),
                     'filename[0]': (filepath, fhandler)
@@ -932,8 +1550,30 @@ class GLPI:
 
         return response.json()
 
+    def _open_document(self, doc_id, offset=0):
+        """Send the request for downloading the file of the document ``doc_id``
+        from byte ``offset`` and return the streamed response (``206`` if the
+        range is honoured by the server, ``200`` for the whole file)."""
+        headers = {
+            'Session-Token': self.session.headers['Session-Token'],
+            'App-Token': self.session.headers['App-Token'],
+            'Accept': 'application/octet-stream'
+        }
+        if offset:
+            headers['Range'] = 'bytes={:d}-'.format(offset)
+        response = self.session.get(url=self._set_method('Document', doc_id),
+                                    headers=headers, stream=True)
+        if response.status_code not in (200, 206, 416):
+            # The error is read from the body before releasing the connection.
+            try:
+                _glpi_error(response)
+            finally:
+                response.close()
+        return response
+
     @_catch_errors
-    def download_document(self, doc_id, dirpath, filename=None):
+    def download_document(self, doc_id, dirpath, filename=None, resume=False,
+                          chunk_size=_CHUNK_SIZE):
         """`API documentation
         <https://github.com/glpi-project/glpi/blob/master/apirest.md#download-a-document-file>`__
 
@@ -942,6 +1582,10 @@ class GLPI:
         from the server otherwise the given value is used. The local path of the file
         is returned by the method.
 
+        The file is written by chunks of ``chunk_size`` bytes so it is never fully
+        loaded in memory. If ``resume`` is set and the file already exists, only
+        the missing bytes are requested (using a HTTP range) and appended to it.
+
         .. code::
 
             glpi.download_file(1, '/tmp')
@@ -953,19 +1597,1000 @@ class GLPI:
             raise GLPIError("unable to download file of document '{:d}': directory "
                             "'{:s}' does not exists".format(doc_id, dirpath))
 
-        response = self.session.get(
-            url=self._set_method('Document', doc_id),
-            headers={
-                'Session-Token': self.session.headers['Session-Token'],
-                'App-Token': self.session.headers['App-Token'],
-                'Accept': 'application/octet-stream'
-            }
-        )
-        if response.status_code != 200:
+        def local_size(filename):
+            filepath = os.path.join(dirpath, filename)
+            return os.path.getsize(filepath) if resume and os.path.exists(filepath) else 0
+
+        offset = local_size(filename) if filename else 0
+        response = self._open_document(doc_id, offset)
+        try:
+            if filename is None:
+                filename = _FILENAME_RE.findall(response.headers['Content-disposition'])[0]
+                offset = local_size(filename)
+                if offset:
+                    response.close()
+                    response = self._open_document(doc_id, offset)
+            filepath = os.path.join(dirpath, filename)
+            # The requested range is not satisfiable: the file is complete, unless
+            # the local file is larger than the remote one which is then downloaded
+            # again.
+            if response.status_code == 416:
+                if _range_complete(response.headers, offset):
+                    return filepath
+                response.close()
+                response = self._open_document(doc_id)
+            with open(filepath, 'ab' if response.status_code == 206 else 'wb') as fhandler:
+                for chunk in response.iter_content(chunk_size):
+                    fhandler.write(chunk)
+        finally:
+            response.close()
+        return filepath
+
+    def iter_document(self, doc_id, offset=0, chunk_size=_CHUNK_SIZE):
+        """Return a generator over the chunks of the file of the document with id
+        ``doc_id``, starting at byte ``offset``. The file is downloaded while
+        the generator is consumed.
+
+        .. code::
+
+            for chunk in glpi.iter_document(1):
+                output.write(chunk)
+        """
+        import requests
+        try:
+            response = self._open_document(doc_id, offset)
+            with response:
+                if response.status_code == 416:
+                    if _range_complete(response.headers, offset):
+                        return
+                    raise GLPIError("offset {:d} is beyond the end of the file of "
+                                    "document '{:d}'".format(offset, doc_id))
+                skip = offset if response.status_code == 200 else 0
+                for chunk in _skip_bytes(response.iter_content(chunk_size), skip):
+                    yield chunk
+        except requests.exceptions.RequestException as err:
+            raise GLPIError('communication error: {:s}'.format(str(err)))
+
+    def download_document_to(self, doc_id, fileobj, offset=0, chunk_size=_CHUNK_SIZE):
+        """Write the file of the document with id ``doc_id`` (from byte ``offset``)
+        in the binary file object ``fileobj`` by chunks and return the number of
+        written bytes.
+
+        .. code::
+
+            >>> with io.BytesIO() as output:
+            >>>     glpi.download_document_to(1, output)
+            14
+        """
+        size = 0
+        for chunk in self.iter_document(doc_id, offset, chunk_size):
+            fileobj.write(chunk)
+            size += len(chunk)
+        return size
+
+def _skip_bytes(chunks, skip):
+    """Generator over ``chunks`` without their first ``skip`` bytes."""
+    for chunk in chunks:
+        if skip:
+            if len(chunk) <= skip:
+                skip -= len(chunk)
+                continue
+            chunk, skip = chunk[skip:], 0
+        yield chunk
+
+async def _askip_bytes(chunks, skip):
+    """Asynchronous version of ``_skip_bytes``."""
+    async for chunk in chunks:
+        if skip:
+            if len(chunk) <= skip:
+                skip -= len(chunk)
+                continue
+            chunk, skip = chunk[skip:], 0
+        yield chunk
+
+async def _aiter_chunks(chunks):
+    """Asynchronous iterator over the ``bytes`` chunks of the iterable ``chunks``."""
+    for chunk in chunks:
+        yield chunk
+
+class _AsyncResponse:
+    """Fully read ``aiohttp`` response exposing the same attributes than a
+    ``requests`` response (``status_code``, ``reason``, ``headers``, ``text``,
+    ``json()``) so status code handlers are shared by both clients."""
+    def __init__(self, status_code, reason, headers, content):
+        self.status_code = status_code
+        self.reason = reason or ''
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+class AsyncGLPI:
+    """Asynchronous counterpart of :class:`GLPI` built on ``aiohttp``. It exposes
+    the same methods but they are coroutines, so waiting for GLPI does not block
+    the event loop:
+
+    .. code::
+
+       glpi = AsyncGLPI(url='https://glpi.exemple.com/apirest.php',
+                        apptoken='YOURAPPTOKEN',
+                        auth='YOURUSERTOKEN')
+       await glpi.init_session()
+       try:
+           await glpi.get_item('Ticket', 1)
+       finally:
+           await glpi.kill_session()
+           await glpi.close()
+
+    Unlike :class:`GLPI`, the constructor does not authenticate as coroutines
+    can't be called from it, use :meth:`init_session` or the :func:`aconnect`
+    context manager.
+
+    ``session`` is an optional ``aiohttp.ClientSession`` shared with other
+    instances (it is not closed by :meth:`close`). When ``auto_reinit`` is set,
+    the GLPI session is initialized on first request and transparently
+    re-initialized when GLPI answers ``ERROR_SESSION_TOKEN_INVALID`` (the
+    request is then sent again once). ``policy`` is the :class:`RequestPolicy`
+    applied to requests (:data:`DEFAULT_POLICY` if not set),
+    ``search_options`` the :class:`SearchOptionsCache` for fields ids
+    (:data:`SEARCH_OPTIONS_CACHE` if not set) and ``dropdowns`` the
+    :class:`DropdownCache` for dropdowns names (:data:`DROPDOWN_CACHE` if not set).
+    """
+    def __init__(self, url, apptoken, auth, verify_certs=True, use_headers=True,
+                 user_agent=None, session=None, auto_reinit=False, policy=None,
+                 search_options=None, dropdowns=None):
+        self.url = url
+        self.apptoken = apptoken
+        self._auth = auth
+        self._use_headers = use_headers
+        self._user_agent = user_agent
+        self._ssl = bool(verify_certs)
+        self.auto_reinit = auto_reinit
+        self.policy = policy or DEFAULT_POLICY
+
+        # ``aiohttp`` session is created on first request when not given as it
+        # must be created from a running event loop.
+        self.session = session
+        self._own_session = session is None
+        self.headers = {}
+
+        # Number of times the GLPI session has been re-initialized.
+        self.reauth_count = 0
+
+        # Use for caching field id/uid map.
+        self._fields = search_options or SEARCH_OPTIONS_CACHE
+        # Use for caching dropdowns names.
+        self._dropdowns = dropdowns or DROPDOWN_CACHE
+
+    def _set_method(self, *endpoints):
+        """Generate the URL from ``endpoints``."""
+        return '/'.join(str(part) for part in [self.url.strip('/'), *endpoints])
+
+    async def _request(self, method, url, headers=None, reinit=True, **kwargs):
+        """Send a request with the session headers updated by ``headers`` (``None``
+        values remove the header) and return the fully read response.
+
+        With ``auto_reinit``, the GLPI session is initialized if needed and
+        renewed when its token is rejected, unless ``reinit`` is unset or the
+        body (``data``) can't be sent twice."""
+        reinit = reinit and self.auto_reinit
+        if reinit and 'Session-Token' not in self.headers:
+            await self.init_session()
+        response = await self._send(method, url, headers, **kwargs)
+        if reinit and 'data' not in kwargs and _is_invalid_token(response):
+            await self.init_session()
+            self.reauth_count += 1
+            response = await self._send(method, url, headers, **kwargs)
+        return response
+
+    async def _send(self, method, url, headers=None, **kwargs):
+        """Send the HTTP request and read the response, applying the request
+        policy."""
+        connect_timeout, read_timeout = self.policy.timeout(_endpoint(url, self.url))
+        kwargs.setdefault('timeout', aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                                           sock_read=read_timeout))
+        # Forms and streams can't be sent twice.
+        replayable = 'data' not in kwargs
+        self.policy.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = await self._send_once(method, url, headers, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                connected = not isinstance(err, _AIOHTTP_CONNECT_ERRORS)
+                if not (replayable and self.policy.should_retry(method, attempt,
+                                                                connected=connected)):
+                    raise
+                await asyncio.sleep(self.policy.delay(attempt))
+            else:
+                if not (replayable and self.policy.should_retry(method, attempt,
+                                                                response.status_code,
+                                                                response.headers)):
+                    return response
+                await asyncio.sleep(self.policy.delay(attempt, response.headers))
+            attempt += 1
+
+    def _headers(self, headers=None):
+        """Return session headers updated by ``headers`` (``None`` values remove
+        the header)."""
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        return {key: value for key, value in request_headers.items() if value is not None}
+
+    async def _send_once(self, method, url, headers=None, **kwargs):
+        """Send the HTTP request and read the response."""
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self._own_session = True
+        async with self.session.request(method, url, headers=self._headers(headers),
+                                        ssl=self._ssl, **kwargs) as response:
+            content = await response.read()
+            return _AsyncResponse(response.status, response.reason,
+                                  response.headers, content)
+
+    async def close(self):
+        """Close the underlying ``aiohttp`` session if it is not shared."""
+        if self.session is not None and self._own_session:
+            await self.session.close()
+        self.session = None
+
+    @_acatch_errors
+    async def init_session(self):
+        """`API documentation
+        <https://github.com/glpi-project/glpi/blob/master/apirest.md#init-session>`__
+
+        Request a session token and set headers required by next API calls.
+        """
+        init_headers, params = _auth_params(self.apptoken, self._auth,
+                                            self._user_agent, self._use_headers)
+        self.headers = {}
+        response = await self._request('GET', self._set_method('initSession'),
+                                       headers=init_headers, params=params,
+                                       reinit=False)
+        session_token = {
+            200: lambda r: r.json()['session_token'],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Session-Token': session_token,
+            'App-Token': self.apptoken
+        }
+        if self._user_agent:
+            self.headers['User-Agent'] = self._user_agent
+
+    @_acatch_errors
+    async def kill_session(self):
+        """`API documentation
+        <https://github.com/glpi-project/glpi/blob/master/apirest.md#kill-session>`__
+
+        Destroy a session identified by a session token. Note that this
+        method is automatically called by the context manager ``aconnect``.
+        """
+        response = await self._request('GET', self._set_method('killSession'),
+                                       reinit=False)
+        self.headers.pop('Session-Token', None)
+        {
+            200: lambda r: r.text,
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_my_profiles(self):
+        """See :meth:`GLPI.get_my_profiles`."""
+        response = await self._request('GET', self._set_method('getMyProfiles'))
+        return {
+            200: lambda r: r.json()['myprofiles'],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_active_profile(self):
+        """See :meth:`GLPI.get_active_profile`."""
+        response = await self._request('GET', self._set_method('getActiveProfile'))
+        return {
+            200: lambda r: r.json()['active_profile'],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def set_active_profile(self, profile_id):
+        """See :meth:`GLPI.set_active_profile`."""
+        response = await self._request('POST', self._set_method('changeActiveProfile'),
+                                       json={'profiles_id': profile_id})
+        {
+            200: lambda r: bool(r.text),
+            400: _glpi_error,
+            401: _glpi_error,
+            404: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_my_entities(self):
+        """See :meth:`GLPI.get_my_entities`."""
+        response = await self._request('GET', self._set_method('getMyEntities'))
+        return {
+            200: lambda r: r.json()['myentities'],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_active_entities(self):
+        """See :meth:`GLPI.get_active_entities`."""
+        response = await self._request('GET', self._set_method('getActiveEntities'))
+        return {
+            200: lambda r: r.json()['active_entity'],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def set_active_entities(self, entity_id, is_recursive=False):
+        """See :meth:`GLPI.set_active_entities`."""
+        data = {'entities_id': entity_id, 'is_recursive': is_recursive}
+        response = await self._request('POST', self._set_method('changeActiveEntities'),
+                                       json=data)
+        return {
+            200: lambda r: bool(r.text),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_full_session(self):
+        """See :meth:`GLPI.get_full_session`."""
+        response = await self._request('GET', self._set_method('getFullSession'))
+        return {
+            200: lambda r: r.json()['session'],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_config(self):
+        """See :meth:`GLPI.get_config`."""
+        response = await self._request('GET', self._set_method('getGlpiConfig'))
+        return {
+            200: lambda r: r.json(),
+            400: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_item(self, itemtype, item_id, **kwargs):
+        """See :meth:`GLPI.get_item`."""
+        response = await self._request('GET', self._set_method(itemtype, item_id),
+                                       params=_convert_bools(kwargs))
+        return {
+            200: lambda r: r.json(),
+            400: _glpi_error,
+            401: _glpi_error,
+            # If object is not found, return None.
+            404: lambda r: None
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_all_items(self, itemtype, **kwargs):
+        """See :meth:`GLPI.get_all_items`."""
+        kwargs.update(_searchtext_params(kwargs.pop('searchText', {})))
+        response = await self._request('GET', self._set_method(itemtype),
+                                       params=_convert_bools(kwargs))
+        return {
+            200: lambda r: r.json(),
+            206: lambda r: r.json(),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_sub_items(self, itemtype, item_id, sub_itemtype, **kwargs):
+        """See :meth:`GLPI.get_sub_items`."""
+        url = self._set_method(itemtype, item_id, sub_itemtype)
+        response = await self._request('GET', url, params=_convert_bools(kwargs))
+        return {
+            200: lambda r: r.json(),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def get_multiple_items(self, *items, **kwargs):
+        """See :meth:`GLPI.get_multiple_items`."""
+        params = _convert_bools(kwargs)
+        params.update({'items[{:d}][{:s}]'.format(idx, key): value
+                       for idx, item in enumerate(items)
+                       for key, value in item.items()})
+        response = await self._request('GET', self._set_method('getMultipleItems'),
+                                       params=params)
+        return {
+            200: lambda r: r.json(),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def list_search_options(self, itemtype, raw=False):
+        """See :meth:`GLPI.list_search_options`."""
+        response = await self._request('GET',
+                                       self._set_method('listSearchOptions', itemtype),
+                                       params='raw' if raw else None)
+        return {
+            200: lambda r: r.json(),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    async def _map_fields(self, itemtype):
+        """Private method that returns a mapping between fields uid and fields
+        id."""
+        return {re.sub('^{:s}.'.format(itemtype), '', field['uid']): field_id
+                for field_id, field in (await self.list_search_options(itemtype)).items()
+                if 'uid' in field}
+
+    async def _field_map(self, itemtype, refresh=False):
+        """See :meth:`GLPI._field_map`."""
+        fields = None if refresh else self._fields.get(self.url, itemtype)
+        if fields is None:
+            fields = self._fields.set(self.url, itemtype, await self._map_fields(itemtype))
+        return fields
+
+    async def field_id(self, itemtype, field_uid, refresh=False):
+        """See :meth:`GLPI.field_id`."""
+        # If this is already an id, just return it
+        if re.match(r'^\d+$', str(field_uid)):
+            return str(field_uid)
+
+        return (await self._field_map(itemtype, refresh)).ids[str(field_uid)]
+
+    async def field_uid(self, itemtype, field_id, refresh=False):
+        """See :meth:`GLPI.field_uid`."""
+        return (await self._field_map(itemtype, refresh)).uids[str(field_id)]
+
+    async def resolve_dropdowns(self, *refs):
+        """See :meth:`GLPI.resolve_dropdowns`."""
+        valid = _dropdown_refs(refs)
+        missing = self._dropdowns.missing(self.url, valid)
+        if missing:
+            items = await self.get_multiple_items(
+                *({'itemtype': itemtype, 'items_id': item_id} for itemtype, item_id in missing))
+            _store_dropdowns(self._dropdowns, self.url, missing, items)
+        return {(itemtype, int(item_id)): self._dropdowns.get(self.url, itemtype, item_id)
+                for itemtype, item_id in refs if item_id is not None}
+
+    async def warm_dropdowns(self, *itemtypes, page_size=_PAGE_SIZE):
+        """See :meth:`GLPI.warm_dropdowns`."""
+        count = 0
+        for itemtype in itemtypes:
+            items = [item async for item in self.iter_all_items(itemtype, page_size=page_size)]
+            self._dropdowns.update(self.url, itemtype, items)
+            count += len(items)
+        return count
+
+    async def _add_forcedisplay(self, itemtype, value):
+        return {
+            'forcedisplay[{:d}]'.format(idx): await self.field_id(itemtype, field)
+            for idx, field in enumerate(value)
+        }
+
+    async def _add_criteria(self, criteria, itemtype, parent=None):
+        '''
+        Recursively generate criteria/metacriteria parameters.
+        '''
+        if not any(isinstance(criteria, t) for t in (list, tuple, set)):
+            raise GLPIError(
+                'search criteria should be a list, found: {:s}'.format(str(type(criteria)))
+            )
+
+        params = {}
+        for idx, criterion in enumerate(criteria):
+            criterion_key = (
+                'criteria[{:d}]'.format(idx)
+                if parent is None
+                else parent + '[criteria][{:d}]'.format(idx)
+            )
+
+            params.update(
+                await self._add_criteria(
+                    criterion.get('criteria', []),
+                    itemtype,
+                    parent=criterion_key
+                )
+            )
+
+            # Add parameters
+            for p, v in criterion.items():
+                if p == 'criteria':
+                    continue
+                params['{:s}[{:s}]'.format(criterion_key, p)] = (
+                    # for 'field' key, map field id
+                    await self.field_id(itemtype, v)
+                    if p == 'field'
+                    else (v.replace("'", "''") if isinstance(v, str) else _convert_bools({p: v})[p])
+                )
+
+        return params
+
+    async def _search_params(self, itemtype, kwargs):
+        """See :meth:`GLPI._search_params`."""
+        params = {}
+        # Format forcedisplay parameter
+        params.update(await self._add_forcedisplay(itemtype, kwargs.pop('forcedisplay', [])))
+        # Add criteria and metacriteria
+        criteria = kwargs.pop('criteria', [])
+        for criterion in kwargs.pop('metacriteria', []):
+            criterion['meta'] = True
+            criteria.append(criterion)
+        params.update(await self._add_criteria(criteria, itemtype))
+        # Add other parameters
+        params.update(_convert_bools(kwargs))
+        return params
+
+    @_acatch_errors
+    async def search(self, itemtype, **kwargs):
+        """See :meth:`GLPI.search`."""
+        params = await self._search_params(itemtype, kwargs)
+        response = await self._request('GET', self._set_method('search', itemtype),
+                                       params=params)
+        return {
+            200: lambda r: r.json().get('data', []),
+            206: lambda r: r.json().get('data', []),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def _get_page(self, url, params, rows, start, page_size):
+        """See :meth:`GLPI._get_page`."""
+        params = dict(params, range=_page_range(start, page_size))
+        response = await self._request('GET', url, params=params)
+        return _page_handler(rows).get(response.status_code, _unknown_error)(response)
+
+    async def _iter_pages(self, url, params, rows, page_size, prefetch):
+        """See :meth:`GLPI._iter_pages`, the next page is requested in a task."""
+        def fetch(start):
+            return self._get_page(url, params, rows, start, page_size)
+
+        pending = None
+        try:
+            start = 0
+            pending = asyncio.ensure_future(fetch(start)) if prefetch else None
+            while True:
+                page, total = await pending if prefetch else await fetch(start)
+                pending = None
+                last = _last_page(page, start, page_size, total)
+                start += page_size
+                if prefetch and not last:
+                    pending = asyncio.ensure_future(fetch(start))
+                for row in page:
+                    yield row
+                if last:
+                    return
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def iter_all_items(self, itemtype, page_size=_PAGE_SIZE, prefetch=True, **kwargs):
+        """Asynchronous version of :meth:`GLPI.iter_all_items`:
+
+        .. code::
+
+            async for computer in glpi.iter_all_items('Computer', page_size=500):
+                print(computer['name'])
+        """
+        kwargs.update(_searchtext_params(kwargs.pop('searchText', {})))
+        async for row in self._iter_pages(self._set_method(itemtype),
+                                          _convert_bools(kwargs), lambda body: body,
+                                          page_size, prefetch):
+            yield row
+
+    async def iter_search(self, itemtype, page_size=_PAGE_SIZE, prefetch=True, **kwargs):
+        """Asynchronous version of :meth:`GLPI.iter_search`."""
+        params = await self._search_params(itemtype, kwargs)
+        async for row in self._iter_pages(self._set_method('search', itemtype), params,
+                                          lambda body: body.get('data', []),
+                                          page_size, prefetch):
+            yield row
+
+    @_acatch_errors
+    async def add(self, itemtype, *items):
+        """See :meth:`GLPI.add`."""
+        response = await self._request('POST', self._set_method(itemtype),
+                                       json={'input': items})
+        return {
+            201: lambda r: r.json(),
+            207: lambda r: r.json()[1],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def add_sub_items(self, itemtype, item_id, sub_itemtype, *items):
+        """See :meth:`GLPI.add_sub_items`."""
+        url = self._set_method(itemtype, item_id, sub_itemtype)
+        response = await self._request('POST', url, json={'input': items})
+        return {
+            201: lambda r: r.json(),
+            207: lambda r: r.json()[1],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def update(self, itemtype, *items):
+        """See :meth:`GLPI.update`."""
+        response = await self._request('PUT', self._set_method(itemtype),
+                                       json={'input': items})
+        return {
+            200: lambda r: r.json(),
+            201: lambda r: r.json(),
+            207: lambda r: r.json()[1],
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def update_sub_items(self, itemtype, item_id, sub_itemtype, *items):
+        """See :meth:`GLPI.update_sub_items`."""
+        url = self._set_method(itemtype, item_id, sub_itemtype)
+        response = await self._request('PUT', url, json={'input': items})
+        return {
+            200: lambda r: r.json(),
+            201: lambda r: r.json(),
+            207: lambda r: r.json(),
+            400: _glpi_error,
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def delete(self, itemtype, *items, **kwargs):
+        """See :meth:`GLPI.delete`."""
+        response = await self._request('DELETE', self._set_method(itemtype),
+                                       params=_convert_bools(kwargs),
+                                       json={'input': items})
+        return {
+            200: lambda r: r.json(),
+            204: lambda r: r.json(),
+            207: lambda r: r.json()[1],
+            400: lambda r: _glpi_error(r) if r.json()[0] != 'ERROR_GLPI_DELETE' else r.json()[1],
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def delete_sub_items(self, itemtype, item_id, sub_itemtype, *items):
+        """See :meth:`GLPI.delete_sub_items`."""
+        url = self._set_method(itemtype, item_id, sub_itemtype)
+        response = await self._request('DELETE', url, json={'input': items})
+        return {
+            200: lambda r: r.json(),
+            204: lambda r: r.json(),
+            207: lambda r: r.json()[1],
+            400: lambda r: _glpi_error(r) if r.json()[0] != 'ERROR_GLPI_DELETE' else r.json()[1],
+            401: _glpi_error
+        }.get(response.status_code, _unknown_error)(response)
+
+    @_acatch_errors
+    async def upload_document(self, name, filepath):
+        """See :meth:`GLPI.upload_document`."""
+        with open(filepath, 'rb') as fhandler:
+            return await self._upload_document(name, os.path.basename(filepath), fhandler)
+
+    @_acatch_errors
+    async def upload_document_stream(self, name, filename, stream,
+                                     content_type='application/octet-stream'):
+        """`API documentation
+        <https://github.com/glpi-project/glpi/blob/master/apirest.md#upload-a-document-file>`__
+
+        Upload the content of ``stream`` as a document named ``name`` with file
+        name ``filename``. ``stream`` can be ``bytes``, a binary file object or an
+        iterable/async iterable of ``bytes`` chunks which is sent as it is
+        consumed, so the file is neither written on disk nor fully loaded in
+        memory.
+
+        .. code::
+
+            async def chunks():
+                async for chunk in response.content.iter_chunked(65536):
+                    yield chunk
+
+            await glpi.upload_document_stream("My test document", 'test.doc', chunks())
+            {'id': 55,
+             'message': 'Item successfully added: My test document',
+             'upload_result': {'filename': [{'name': ...}]}}
+
+        As the stream can't be read twice, the request is never retried.
+        """
+        if (not isinstance(stream, (bytes, bytearray, memoryview, io.IOBase))
+                and not hasattr(stream, '__aiter__')):
+            stream = _aiter_chunks(stream)
+        return await self._upload_document(name, filename, stream, content_type)
+
+    async def _upload_document(self, name, filename, value, content_type=None):
+        """Send the multipart request uploading ``value`` and check the result
+        (see :meth:`GLPI.upload_document`)."""
+        # Unquoted fields so non ASCII file names match the manifest (as ``requests``).
+        form = aiohttp.FormData(quote_fields=False)
+        form.add_field('uploadManifest',
+                       _upload_manifest(name, filename),
+                       content_type='application/json')
+        form.add_field('filename[0]', value, filename=filename, content_type=content_type)
+        response = await self._request('POST', self._set_method('Document'),
+                                       headers={'Content-Type': None},
+                                       data=form)
+
+        if response.status_code != 201:
             _glpi_error(response)
 
-        filename = filename or _FILENAME_RE.findall(response.headers['Content-disposition'])[0]
+        doc_id = response.json()['id']
+        error = response.json()['upload_result']['filename'][0].get('error', None)
+        if error is not None:
+            warnings.warn(_WARN_DEL_DOC.format(doc_id), UserWarning)
+            try:
+                await self.delete('Document', {'id': doc_id}, force_purge=True)
+            except GLPIError as err:
+                warnings.warn(_WARN_DEL_ERR.format(doc_id, str(err)), UserWarning)
+            raise GLPIError('(ERROR_GLPI_INVALID_DOCUMENT) {:s}'.format(error))
+
+        return response.json()
+
+    @asynccontextmanager
+    async def _open_document(self, doc_id, offset=0):
+        """Context manager yielding the ``aiohttp`` response (body not read) of the
+        request for downloading the file of the document ``doc_id`` from byte
+        ``offset`` (see :meth:`GLPI._open_document`)."""
+        headers = {'Content-Type': None, 'Accept': 'application/octet-stream'}
+        if offset:
+            headers['Range'] = 'bytes={:d}-'.format(offset)
+        url = self._set_method('Document', doc_id)
+        if self.auto_reinit and 'Session-Token' not in self.headers:
+            await self.init_session()
+        response = await self._send_stream(url, headers)
+        try:
+            if response.status not in (200, 206, 416):
+                error = _AsyncResponse(response.status, response.reason,
+                                       response.headers, await response.read())
+                if self.auto_reinit and _is_invalid_token(error):
+                    response.release()
+                    await self.init_session()
+                    self.reauth_count += 1
+                    response = await self._send_stream(url, headers)
+                    if response.status not in (200, 206, 416):
+                        _glpi_error(_AsyncResponse(response.status, response.reason,
+                                                   response.headers, await response.read()))
+                else:
+                    _glpi_error(error)
+            yield response
+        finally:
+            response.release()
+
+    async def _send_stream(self, url, headers):
+        """Send a ``GET`` request applying the request policy like :meth:`_send`
+        but return the ``aiohttp`` response without reading its body (it must be
+        released by the caller)."""
+        connect_timeout, read_timeout = self.policy.timeout(_endpoint(url, self.url))
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self._own_session = True
+        self.policy.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = await self.session.get(url, headers=self._headers(headers),
+                                                  ssl=self._ssl, timeout=timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                connected = not isinstance(err, _AIOHTTP_CONNECT_ERRORS)
+                if not self.policy.should_retry('GET', attempt, connected=connected):
+                    raise
+                await asyncio.sleep(self.policy.delay(attempt))
+            else:
+                if (response.status in (200, 206, 416) or
+                        not self.policy.should_retry('GET', attempt, response.status,
+                                                     response.headers)):
+                    return response
+                response.release()
+                await asyncio.sleep(self.policy.delay(attempt, response.headers))
+            attempt += 1
+
+    @_acatch_errors
+    async def download_document(self, doc_id, dirpath, filename=None, resume=False,
+                                chunk_size=_CHUNK_SIZE):
+        """See :meth:`GLPI.download_document`."""
+        if not os.path.exists(dirpath):
+            raise GLPIError("unable to download file of document '{:d}': directory "
+                            "'{:s}' does not exists".format(doc_id, dirpath))
+
+        def local_size(filename):
+            filepath = os.path.join(dirpath, filename)
+            return os.path.getsize(filepath) if resume and os.path.exists(filepath) else 0
+
+        offset = local_size(filename) if filename else 0
+        if filename is None:
+            async with self._open_document(doc_id) as response:
+                filename = _FILENAME_RE.findall(response.headers['Content-disposition'])[0]
+                offset = local_size(filename)
+                if not offset:
+                    return await _write_chunks(response, os.path.join(dirpath, filename),
+                                               chunk_size)
         filepath = os.path.join(dirpath, filename)
-        with open(filepath, 'wb') as fhandler:
-            fhandler.write(response.content)
+        async with self._open_document(doc_id, offset) as response:
+            if response.status != 416 or _range_complete(response.headers, offset):
+                return await _write_chunks(response, filepath, chunk_size)
+        # The local file is larger than the remote one: download it again.
+        async with self._open_document(doc_id) as response:
+            return await _write_chunks(response, filepath, chunk_size)
+
+    async def iter_document(self, doc_id, offset=0, chunk_size=_CHUNK_SIZE):
+        """Asynchronous version of :meth:`GLPI.iter_document`:
+
+        .. code::
+
+            async for chunk in glpi.iter_document(1):
+                await consumer(chunk)
+        """
+        try:
+            async with self._open_document(doc_id, offset) as response:
+                if response.status == 416:
+                    if _range_complete(response.headers, offset):
+                        return
+                    raise GLPIError("offset {:d} is beyond the end of the file of "
+                                    "document '{:d}'".format(offset, doc_id))
+                skip = offset if response.status == 200 else 0
+                async for chunk in _askip_bytes(response.content.iter_chunked(chunk_size),
+                                                skip):
+                    yield chunk
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise GLPIError('communication error: {:s}'.format(str(err) or repr(err)))
+
+    async def download_document_to(self, doc_id, fileobj, offset=0, chunk_size=_CHUNK_SIZE):
+        """See :meth:`GLPI.download_document_to`."""
+        size = 0
+        async for chunk in self.iter_document(doc_id, offset, chunk_size):
+            fileobj.write(chunk)
+            size += len(chunk)
+        return size
+
+async def _write_chunks(response, filepath, chunk_size):
+    """Write the body of the ``aiohttp`` document ``response`` by chunks in the file
+    ``filepath`` (appended to it for a partial content) and return ``filepath``."""
+    # The requested range is not satisfiable: the file is complete (checked by
+    # the caller).
+    if response.status == 416:
         return filepath
+    with open(filepath, 'ab' if response.status == 206 else 'wb') as fhandler:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            fhandler.write(chunk)
+    return filepath
+
+class GLPIPool:
+    """Process wide pool of authenticated :class:`AsyncGLPI` sessions sharing the
+    same HTTP connections. Sessions are initialized by :meth:`start`, leased to
+    callers and only killed by :meth:`close`, which avoids the ``initSession``
+    and ``killSession`` round trips of :func:`aconnect` for each operation:
+
+    .. code::
+
+        >>> pool = GLPIPool(URL, APPTOKEN, USERTOKEN, size=4)
+        >>> await pool.start()
+        >>> async with pool.lease() as glpi:
+        >>>     await glpi.get_item('Ticket', 1)
+        >>> pool.stats()
+        {'size': 4, 'idle': 4, 'in_use': 0, 'leases': 1, 'waits': 0,
+         'wait_time': 0.0, 'max_wait': 0.0, 'reauths': 0, 'retries': 0,
+         'retry_budget_exhausted': 0}
+        >>> await pool.close()
+
+    Sessions are re-initialized transparently when their token expires (see
+    ``auto_reinit`` of :class:`AsyncGLPI`). A session which could not be
+    initialized by :meth:`start` is initialized on its first use.
+    ``policy``, ``search_options`` and ``dropdowns`` are given to all sessions
+    (see :class:`AsyncGLPI`).
+    """
+    def __init__(self, url, apptoken, auth, size=4, verify_certs=True,
+                 use_headers=True, user_agent=None, policy=None, search_options=None,
+                 dropdowns=None):
+        if size < 1:
+            raise GLPIError('pool size should be at least 1, found: {:d}'.format(size))
+        self.url = url
+        self.size = size
+        self.policy = policy or DEFAULT_POLICY
+        self._params = dict(apptoken=apptoken, auth=auth, verify_certs=verify_certs,
+                            use_headers=use_headers, user_agent=user_agent,
+                            policy=self.policy, search_options=search_options,
+                            dropdowns=dropdowns)
+        self._session = None
+        self._sessions = []
+        self._idle = None
+        self._start_lock = asyncio.Lock()
+        self._leases = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def started(self):
+        return self._idle is not None
+
+    async def start(self):
+        """Create the HTTP session and initialize ``size`` GLPI sessions. Errors
+        are raised only if no session at all could be initialized."""
+        async with self._start_lock:
+            if self.started:
+                return
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.size * 2))
+            self._sessions = [AsyncGLPI(self.url, session=self._session,
+                                        auto_reinit=True, **self._params)
+                              for _ in range(self.size)]
+            results = await asyncio.gather(*(glpi.init_session() for glpi in self._sessions),
+                                           return_exceptions=True)
+            self._idle = asyncio.Queue()
+            for glpi in self._sessions:
+                self._idle.put_nowait(glpi)
+            errors = [res for res in results if isinstance(res, BaseException)]
+            if len(errors) == len(self._sessions):
+                raise GLPIError('unable to initialize GLPI sessions: {:s}'.format(str(errors[0])))
+
+    @asynccontextmanager
+    async def lease(self):
+        """Context manager yielding an idle session, waiting for one to be released
+        if all are in use."""
+        if not self.started:
+            try:
+                await self.start()
+            except GLPIError:
+                # Sessions will be initialized on first use.
+                pass
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self._idle.empty():
+            self._waits += 1
+        glpi = await self._idle.get()
+        wait = loop.time() - start
+        self._leases += 1
+        self._wait_time += wait
+        self._max_wait = max(self._max_wait, wait)
+        try:
+            yield glpi
+        finally:
+            self._idle.put_nowait(glpi)
+
+    async def close(self):
+        """Kill all GLPI sessions and close the HTTP session."""
+        if not self.started:
+            # start() may have been cancelled while initializing sessions.
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+            return
+        await asyncio.gather(*(glpi.kill_session() for glpi in self._sessions
+                               if 'Session-Token' in glpi.headers),
+                             return_exceptions=True)
+        await self._session.close()
+        self._session = None
+        self._idle = None
+
+    def stats(self):
+        """Return usage counters of the pool (wait times are in seconds)."""
+        idle = self._idle.qsize() if self.started else 0
+        return {
+            'size': self.size,
+            'idle': idle,
+            'in_use': self.size - idle if self.started else 0,
+            'leases': self._leases,
+            'waits': self._waits,
+            'wait_time': self._wait_time,
+            'max_wait': self._max_wait,
+            'reauths': sum(glpi.reauth_count for glpi in self._sessions),
+            'retries': self.policy.budget.retries,
+            'retry_budget_exhausted': self.policy.budget.exhausted
+        }
@@ -8,12 +8,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-import config
-from glpi_api import connect
 from keyboards.inline_kb import get_cancel_kb, get_return_main_menu_kb
 from states.renewal_states import ClaimRenewal
-from utils.helpers import load_train_list, is_wagon_sn_valid
+from utils.helpers import format_wagon_attributes, is_wagon_sn_valid
+from utils.train_catalog import get_train_catalog
 from utils.renewal_utils import show_renewal_summary
+from utils.ticket_writer import ticket_writer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,15 +37,13 @@ CALLBACK_RENEWAL_SEARCH = "renewal_search_train"
 # === Отображение страницы со списком поездов ===
 async def show_renewal_train_page(message: Message, state: FSMContext, page: int):
     data = await state.get_data()
-    trains = data.get("trains", [])
-    if not trains:
+    catalog = get_train_catalog(data.get("catalog_version"))
+    if not len(catalog):
         await message.answer("❌ Список поездов пуст.")
         return
 
-    # Пагинация
-    start_idx = page * ITEMS_PER_PAGE
-    end_idx = start_idx + ITEMS_PER_PAGE
-    page_trains = trains[start_idx:end_idx]
+    # Пагинация по общему каталогу, в FSM только версия каталога и страница
+    page_trains, has_next = catalog.page(page, ITEMS_PER_PAGE)
 
     keyboard = InlineKeyboardBuilder()
 
@@ -61,7 +59,7 @@ async def show_renewal_train_page(message: Message, state: FSMContext, page: int
     nav_buttons = []
     if page > 0:
         nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=CALLBACK_RENEWAL_PAGE_PREV))
-    if end_idx < len(trains):
+    if has_next:
         nav_buttons.append(InlineKeyboardButton(text="➡️ Вперед", callback_data=CALLBACK_RENEWAL_PAGE_NEXT))
 
     if nav_buttons:
@@ -110,14 +108,11 @@ async def renewal_executor_name(message: Message, state: FSMContext):
         return
     await state.update_data(executor_name=message.text)
     await message.answer(f"✅ ФИО ответственного сотрудника: {message.text}") # Added line
-    data = await state.get_data()
-    trains = data.get("trains", [])
-    if not trains:
-        trains = load_train_list()
-        if not trains:
-            await message.answer("❌ Список поездов пуст или не найден.")
-            return
-    await state.update_data(trains=trains, page=0)
+    catalog = get_train_catalog()
+    if not len(catalog):
+        await message.answer("❌ Список поездов пуст или не найден.")
+        return
+    await state.update_data(catalog_version=catalog.version, page=0)
     await show_renewal_train_page(message, state, 0)
 
 
@@ -158,19 +153,17 @@ async def open_renewal_search_train(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(ClaimRenewal.train_search)
+@router.message(ClaimRenewal.train_search, flags={"throttle": "search"})
 async def search_renewal_train(message: Message, state: FSMContext):
     logger.info(f"[v1] Поиск поезда по тексту | Состояние: {await state.get_state()}")
-    query = message.text.strip().upper()
-    data = await state.get_data()
-    all_trains = data.get("trains", []) or load_train_list()
-    results = [t for t in all_trains if t.upper().startswith(query)]
+    query = message.text.strip()
+    results = get_train_catalog().search(query, limit=10)
     if not results:
         await message.answer("❌ По вашему запросу поездов не найдено.")
         return
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=train, callback_data=f"{CALLBACK_RENEWAL_TRAIN_SELECT}{train}")]
-        for train in results[:10]
+        for train in results
     ])
     await message.answer("Выберите поезд из результатов поиска:", reply_markup=kb)
 
@@ -186,7 +179,7 @@ async def renewal_wagon_sn(message: Message, state: FSMContext):
         return
     # Проверка наличия в базе (в файле)
     if not await is_wagon_sn_valid(sn):
-        await message.answer("❌ Вагон с таким серийным номером не найден в базе.")
+        await message.answer("❌ Вагон с таким серийным номером не найден в базе или не активен.")
         return
     await state.update_data(wagon_sn=sn)
     await message.answer(f"✅ Серийный номер вагона: {sn}") # Added line
@@ -278,44 +271,46 @@ async def renewal_comment(message: Message, state: FSMContext):
     await show_renewal_summary(message, state)
 
 
-@router.callback_query(F.data == "create_renewal_claim", ClaimRenewal.confirmation)
+@router.callback_query(F.data == "create_renewal_claim", ClaimRenewal.confirmation,
+                       flags={"throttle": "claim", "idempotent": True})
 async def create_renewal_claim(callback: CallbackQuery, state: FSMContext):
     logger.info(f"[v1] Создание заявки | Callback: {callback.data} | Состояние: {await state.get_state()}")
     data = await state.get_data()
     data.setdefault('comment', '')
+    # Номер заявки возвращается middleware идемпотентности (повторные нажатия)
+    ticket_id = None
     try:
-        with connect(config.GLPI_URL, config.GLPI_APP_TOKEN, config.GLPI_USER_TOKEN, False) as glpi:
-            content = (
-                f"Заявка создана через Telegram\n#телеграм\n"
-                f"ФИО исполнителя: {data['executor_name']}\n"
-                f"Поезд: {data['train_number']}\n"
-                f"Количество вагонов: 1\n"
-                f"Серийный номер вагона: {data['wagon_sn']}\n"
-                f"Место: {data['location']}\n"
-                f"Дата и время: {data['datetime']}\n"
-                f"Комментарий: {data['comment']}"
-            )
-            ticket_result = glpi.add("Ticket", {
-                "name": "API GLPI - Переоснащение",
-                "content": content,
-                "urgency": 4,
-                "impact": 4,
-                "priority": 4,
-                "type": 1,
-                "requesttypes_id": 1,
-                "itilcategories_id": 38,
-                "entities_id": 16,
-                "_users_id_observer": [22]
-            })
-            ticket_id = ticket_result[0]["id"]
-            claim_info = (
-                "✅ Заявка успешно создана в системе GLPI!\n"
-                f"🔢 Номер заявки: {ticket_id}\n"
-                f"📍 Поезд: {data['train_number']}, "
-                f"📍 Вагон: {data['wagon_sn']}"
-            )
-            await callback.message.answer(claim_info, reply_markup=get_return_main_menu_kb())
-            await state.clear()
+        content = (
+            f"Заявка создана через Telegram\n#телеграм\n"
+            f"ФИО исполнителя: {data['executor_name']}\n"
+            f"Поезд: {data['train_number']}\n"
+            f"Количество вагонов: 1\n"
+            f"Серийный номер вагона: {data['wagon_sn']}\n"
+            f"{format_wagon_attributes(data['wagon_sn'])}"
+            f"Место: {data['location']}\n"
+            f"Дата и время: {data['datetime']}\n"
+            f"Комментарий: {data['comment']}"
+        )
+        ticket_id = await ticket_writer.submit({
+            "name": "API GLPI - Переоснащение",
+            "content": content,
+            "urgency": 4,
+            "impact": 4,
+            "priority": 4,
+            "type": 1,
+            "requesttypes_id": 1,
+            "itilcategories_id": 38,
+            "entities_id": 16,
+            "_users_id_observer": [22]
+        })
+        claim_info = (
+            "✅ Заявка успешно создана в системе GLPI!\n"
+            f"🔢 Номер заявки: {ticket_id}\n"
+            f"📍 Поезд: {data['train_number']}, "
+            f"📍 Вагон: {data['wagon_sn']}"
+        )
+        await callback.message.answer(claim_info, reply_markup=get_return_main_menu_kb())
+        await state.clear()
     except Exception as e:
         logger.error(f"[GLPI Error] {e}")
         await callback.message.answer(
@@ -323,3 +318,4 @@ async def create_renewal_claim(callback: CallbackQuery, state: FSMContext):
             reply_markup=get_return_main_menu_kb()
         )
         await state.clear()
+    return ticket_id
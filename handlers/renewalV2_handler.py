@@ -6,15 +6,17 @@ from datetime import datetime as dt_datetime, timedelta
 from aiogram import Router, F
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-import config
-import glpi_api
 from keyboards.inline_kb import get_cancel_kb, get_return_main_menu_kb
 from states.renewal_states import ClaimRenewalV2
-from utils.helpers import load_train_list
-from utils.renewal_utils import download_file, show_renewal_summary_v2
+from utils.glpi_client import glpi_pool
+from utils.helpers import format_serial_errors, format_wagon_attributes, split_wagon_sns, validate_serials
+from utils.train_catalog import get_train_catalog
+from utils.renewal_utils import stream_file, show_renewal_summary_v2
+from utils.static_assets import static_assets
+from utils.ticket_writer import ticket_writer
 
 # === Настройка логирования ===
 logging.basicConfig(level=logging.INFO)
@@ -39,17 +41,13 @@ CALLBACK_RENEWAL_V2_SEARCH = "renewalV2_search_train"
 # === Отображение страницы со списком поездов ===
 async def show_renewal_train_page(message: Message, state: FSMContext, page: int):
     data = await state.get_data()
-    trains = data.get("trains", [])
+    catalog = get_train_catalog(data.get("catalog_version"))
 
-    if not trains:
-        trains = load_train_list()
-        if not trains:
-            await message.answer("❌ Список поездов пуст или не найден.")
-            return
+    if not len(catalog):
+        await message.answer("❌ Список поездов пуст или не найден.")
+        return
 
-    start_idx = page * ITEMS_PER_PAGE
-    end_idx = start_idx + ITEMS_PER_PAGE
-    page_trains = trains[start_idx:end_idx]
+    page_trains, has_next = catalog.page(page, ITEMS_PER_PAGE)
 
     kb = InlineKeyboardBuilder()
     for train_id in page_trains:
@@ -58,7 +56,7 @@ async def show_renewal_train_page(message: Message, state: FSMContext, page: int
     nav_buttons = []
     if page > 0:
         nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=CALLBACK_RENEWAL_V2_PAGE_PREV))
-    if end_idx < len(trains):
+    if has_next:
         nav_buttons.append(InlineKeyboardButton(text="➡️ Вперед", callback_data=CALLBACK_RENEWAL_V2_PAGE_NEXT))
 
     if nav_buttons:
@@ -102,15 +100,12 @@ async def renewal_executor_name(message: Message, state: FSMContext):
         return
 
     await state.update_data(executor_name=message.text)
-    data = await state.get_data()
-    trains = data.get("trains", [])
-    if not trains:
-        trains = load_train_list()
-        if not trains:
-            await message.answer("❌ Список поездов пуст или не найден.")
-            return
-
-    await state.update_data(trains=trains, page=0)
+    catalog = get_train_catalog()
+    if not len(catalog):
+        await message.answer("❌ Список поездов пуст или не найден.")
+        return
+
+    await state.update_data(catalog_version=catalog.version, page=0)
     await show_renewal_train_page(message, state, 0)
 
 
@@ -164,13 +159,11 @@ async def open_renewal_search_train(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(ClaimRenewalV2.train_search)
+@router.message(ClaimRenewalV2.train_search, flags={"throttle": "search"})
 async def search_renewal_train(message: Message, state: FSMContext):
     logger.info(f"[v2] Поиск поезда по тексту | Состояние: {await state.get_state()}")
-    query = message.text.strip().upper()
-    data = await state.get_data()
-    all_trains = data.get("trains", []) or load_train_list()
-    results = [t for t in all_trains if t.upper().startswith(query)]
+    query = message.text.strip()
+    results = get_train_catalog().search(query, limit=10)
 
     if not results:
         await message.answer("❌ По вашему запросу поездов не найдено.")
@@ -178,7 +171,7 @@ async def search_renewal_train(message: Message, state: FSMContext):
 
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=f"🚆 Поезд №{train}", callback_data=f"{CALLBACK_RENEWAL_V2_TRAIN_SELECT}{train}")]
-        for train in results[:10]
+        for train in results
     ])
     await message.answer("Выберите поезд из результатов поиска:", reply_markup=kb)
 
@@ -193,24 +186,64 @@ async def renewal_wagon_count(message: Message, state: FSMContext):
         return
 
     data = await state.get_data()
-    if data.get("editing_field") == "wagon_count":
+    wagon_sns = list(filter(None, data.get("wagon_sn", "").split(", ")))
+    if data.get("editing_field") == "wagon_count" and len(wagon_sns) == int(count):
         await state.update_data(wagon_count=count)
         await message.answer(f"✅ Количество вагонов изменено на: {count}")
         await show_renewal_summary_v2(message, state)
         await state.update_data(editing_field=None)
     else:
         await state.update_data(wagon_count=count)
-        await state.set_state(ClaimRenewalV2.location)
-        await message.answer(f"✅ Количество вагонов : {count}")
+        await state.set_state(ClaimRenewalV2.wagon_sn)
+        if data.get("editing_field") == "wagon_count":
+            # Номеров вагонов стало не столько, сколько вагонов: список вводится заново
+            await message.answer(f"✅ Количество вагонов изменено на: {count}")
+        else:
+            await message.answer(f"✅ Количество вагонов : {count}")
         await message.answer(
-            "Выберите место проведения работ:",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=loc, callback_data=key)]
-                for key, loc in LOCATIONS.items()
-            ])
+            "Отправьте серийные номера вагонов одним сообщением — "
+            "по одному в строке или через запятую (например: 112 13456, 11213457):",
+            reply_markup=get_cancel_kb()
         )
 
 
+# === Ввод серийных номеров вагонов (весь состав одним сообщением) ===
+@router.message(ClaimRenewalV2.wagon_sn)
+async def renewal_wagon_sns(message: Message, state: FSMContext):
+    logger.info(f"[v2] Ввод серийных номеров | Состояние: {await state.get_state()}")
+    data = await state.get_data()
+    count = int(data["wagon_count"])
+    results = await validate_serials(split_wagon_sns(message.text or ""))
+
+    errors = format_serial_errors(results)
+    if errors:
+        await message.answer(f"❌ Проверьте номера вагонов:\n{errors}\n\nОтправьте список целиком ещё раз.")
+        return
+    if len(results) != count:
+        await message.answer(
+            f"❌ Указано номеров: {len(results)}, а вагонов в заявке: {count}.\n"
+            "Отправьте список целиком ещё раз."
+        )
+        return
+
+    wagon_sns = [result["wagon_sn"] for result in results]
+    await state.update_data(wagon_sn=", ".join(wagon_sns))
+    await message.answer(f"✅ Серийные номера вагонов: {', '.join(wagon_sns)}")
+    if data.get("editing_field") == "wagon_count":
+        # Список введён заново после изменения количества вагонов в сводке
+        await show_renewal_summary_v2(message, state)
+        await state.update_data(editing_field=None)
+        return
+    await state.set_state(ClaimRenewalV2.location)
+    await message.answer(
+        "Выберите место проведения работ:",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text=loc, callback_data=key)]
+            for key, loc in LOCATIONS.items()
+        ])
+    )
+
+
 
 
 # === Выбор места ===
@@ -295,8 +328,8 @@ async def renewal_custom_time(message: Message, state: FSMContext):
         file_path = "files/Form.doc"
         if os.path.exists(file_path):
             try:
-                document = FSInputFile(path=file_path, filename="Форма_заявки.doc")
-                await message.answer_document(document=document)
+                # Форма загружается в Telegram один раз, дальше отправляется по file_id
+                await static_assets.send_document(message, file_path, filename="Форма_заявки.doc")
             except Exception as e:
                 logger.error(f"[v2] Ошибка при отправке файла: {e}", exc_info=True)
                 await message.answer("⚠️ Не удалось отправить форму. Попробуйте позже.")
@@ -361,77 +394,84 @@ async def skip_document(callback: CallbackQuery, state: FSMContext):
 
 
 # === Создание заявки ===
-@router.callback_query(F.data == "create_renewalV2_claim", ClaimRenewalV2.confirmation)
+@router.callback_query(F.data == "create_renewalV2_claim", ClaimRenewalV2.confirmation,
+                       flags={"throttle": "claim", "idempotent": True})
 async def create_renewal_claim_v2(callback: CallbackQuery, state: FSMContext):
     logger.info(f"[v2] Создание заявки | Callback: {callback.data} | Состояние: {await state.get_state()}")
 
+    # Номер заявки возвращается middleware идемпотентности (повторные нажатия)
+    ticket_id = None
     try:
         data = await state.get_data()
         logger.debug("[v2] Полученные данные состояния: %s", data)
 
-        with glpi_api.connect(config.GLPI_URL, config.GLPI_APP_TOKEN, config.GLPI_USER_TOKEN, False) as glpi:
-            logger.debug("[v2] Подключение к GLPI установлено")
-
-            content = (
-                f"Заявка создана через Telegram\n#телеграм\n"
-                f"ФИО исполнителя: {data['executor_name']}\n"
-                f"Поезд: {data['train_number']}\n"
-                f"Количество вагонов: {data['wagon_count']}\n"
-                f"Место: {data['location']}\n"
-                f"Дата и время: {data['datetime']}\n"
-            )
-            logger.debug("[v2] Содержимое заявки:\n%s", content)
-
-            ticket_data = {
-                "name": "API GLPI - Переоснащение v2",
-                "content": content,
-                "urgency": 4,
-                "impact": 4,
-                "priority": 4,
-                "type": 1,
-                "requesttypes_id": 1,
-                "itilcategories_id": 39,
-                "entities_id": 16,
-                "_users_id_observer": [22],
-            }
-            logger.debug("[v2] Данные для создания заявки: %s", ticket_data)
-
-            logger.debug("[v2] Отправка запроса на создание заявки")
-            ticket_result = glpi.add("Ticket", ticket_data)
-            logger.debug("[v2] Заявка создана: %s", ticket_result)
-
-            ticket_id = ticket_result[0]["id"]
-            claim_info = (
-                "✅ Заявка успешно создана в системе GLPI!\n"
-                f"🔢 Номер заявки: {ticket_id}\n"
-                f"📍 Поезд: {data['train_number']},"
-                f" Вагонов: {data['wagon_count']}"
-            )
+        # Атрибуты каждого вагона из реестра (модель, тип, предприятие)
+        wagons_info = "".join(
+            f"\nВагон {wagon_sn}:\n{format_wagon_attributes(wagon_sn)}"
+            for wagon_sn in filter(None, data.get("wagon_sn", "").split(", "))
+        )
+        content = (
+            f"Заявка создана через Telegram\n#телеграм\n"
+            f"ФИО исполнителя: {data['executor_name']}\n"
+            f"Поезд: {data['train_number']}\n"
+            f"Количество вагонов: {data['wagon_count']}\n"
+            f"Серийные номера вагонов: {data.get('wagon_sn', 'не указаны')}\n"
+            f"Место: {data['location']}\n"
+            f"Дата и время: {data['datetime']}\n"
+            f"{wagons_info}"
+        )
+        logger.debug("[v2] Содержимое заявки:\n%s", content)
+
+        ticket_data = {
+            "name": "API GLPI - Переоснащение v2",
+            "content": content,
+            "urgency": 4,
+            "impact": 4,
+            "priority": 4,
+            "type": 1,
+            "requesttypes_id": 1,
+            "itilcategories_id": 39,
+            "entities_id": 16,
+            "_users_id_observer": [22],
+        }
+        logger.debug("[v2] Данные для создания заявки: %s", ticket_data)
+
+        logger.debug("[v2] Отправка запроса на создание заявки")
+        ticket_id = await ticket_writer.submit(ticket_data)
+        logger.debug("[v2] Заявка создана: %s", ticket_id)
+
+        claim_info = (
+            "✅ Заявка успешно создана в системе GLPI!\n"
+            f"🔢 Номер заявки: {ticket_id}\n"
+            f"📍 Поезд: {data['train_number']},"
+            f" Вагонов: {data['wagon_count']}"
+        )
 
-            if data.get("document"):
-                doc = data["document"]
-                file_path = await download_file(callback.bot, doc["file_id"])
+        if data.get("document"):
+            doc = data["document"]
 
-                try:
-                    upload_result = glpi.upload_document(doc["file_id"], file_path)
+            try:
+                async with glpi_pool.lease() as glpi:
+                    # Файл передаётся из Telegram в GLPI потоком, без временного файла
+                    upload_result = await glpi.upload_document_stream(
+                        doc["file_id"], doc["file_name"], stream_file(callback.bot, doc["file_id"])
+                    )
                     logger.debug(f"[v2] Файл загружен: {upload_result}")
 
                     document_id = upload_result['id']
 
-                    glpi.add("Document_Item", {
+                    await glpi.add("Document_Item", {
                         "documents_id": document_id,
                         "items_id": ticket_id,
                         "itemtype": "Ticket"
                     })
 
                     logger.debug(f"[v2] Документ #{document_id} привязан к заявке #{ticket_id}")
-                except Exception as e:
-                    logger.error(f"[v2] Ошибка при загрузке или привязке файла: {e}", exc_info=True)
-                finally:
-                    os.remove(file_path)
-            await callback.message.answer(claim_info, reply_markup=get_return_main_menu_kb())
-            await state.clear()
-            logger.info("[v2] Заявка #%d успешно обработана", ticket_id)
+            except Exception as e:
+                logger.error(f"[v2] Ошибка при загрузке или привязке файла: {e}", exc_info=True)
+        await callback.message.answer(claim_info, reply_markup=get_return_main_menu_kb())
+        await state.clear()
+        logger.info("[v2] Заявка #%d успешно обработана", ticket_id)
 
     except Exception as e:
         logger.error(f"[GLPI Error] {e}", exc_info=True)
@@ -440,3 +480,4 @@ async def create_renewal_claim_v2(callback: CallbackQuery, state: FSMContext):
             reply_markup=get_return_main_menu_kb()
         )
         await state.clear()
+    return ticket_id
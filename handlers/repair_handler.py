@@ -7,11 +7,11 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
 
-import config
-from glpi_api import connect
 from keyboards.inline_kb import get_checkbox_kb_with_other, get_cancel_kb, get_return_main_menu_kb
 from states.repair_states import ClaimRepair
-from utils.helpers import load_train_list, is_wagon_sn_valid
+from utils.helpers import format_wagon_attributes, validate_serials
+from utils.train_catalog import get_train_catalog
+from utils.ticket_writer import ticket_writer
 
 router = Router()
 
@@ -76,10 +76,8 @@ async def show_repair_summary(message: Union[Message, CallbackQuery], state: FSM
 
 async def show_train_page(callback: CallbackQuery, state: FSMContext, page: int):
     data = await state.get_data()
-    trains = data.get("trains", [])
-    start_index = page * ITEMS_PER_PAGE
-    end_index = min(start_index + ITEMS_PER_PAGE, len(trains))
-    current_page_trains = trains[start_index:end_index]
+    catalog = get_train_catalog(data.get("catalog_version"))
+    current_page_trains, has_next = catalog.page(page, ITEMS_PER_PAGE)
     keyboard_buttons = [
         [InlineKeyboardButton(text=f"🚆 Поезд №{train}", callback_data=f"train_{train}")]
         for train in current_page_trains
@@ -87,7 +85,7 @@ async def show_train_page(callback: CallbackQuery, state: FSMContext, page: int)
     nav_buttons = []
     if page > 0:
         nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"page_prev_{page - 1}"))
-    if end_index < len(trains):
+    if has_next:
         nav_buttons.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"page_next_{page + 1}"))
     keyboard_buttons.append([InlineKeyboardButton(text="🔍 Поиск поезда", callback_data="search_train")])
     if nav_buttons:
@@ -102,8 +100,8 @@ async def process_common_field(message: Message, state: FSMContext,
     if validation_func and not validation_func(value):
         await message.answer(error_msg)
         return False
-    await state.update_data({field_name: value})
-    logger.info(f"State data after update for {field_name}: {await state.get_data()}")
+    data = await state.update_data({field_name: value})
+    logger.info(f"State data after update for {field_name}: {data}")
     if field_name == "wagon_number":
         await message.answer(f"✅ Номер вагона: {value}")
     elif field_name == "wagon_sn":
@@ -112,7 +110,6 @@ async def process_common_field(message: Message, state: FSMContext,
         await message.answer(f"✅ Выбранные проблемы: {value}")
     elif field_name == "manual_problem":
         await message.answer(f"✅ Проблема (вручную): {value}")
-    data = await state.get_data()
     if data.get('editing'):
         await state.update_data(editing=False)
         await show_repair_summary(message, state)
@@ -126,11 +123,11 @@ async def process_common_field(message: Message, state: FSMContext,
 async def handle_restoration(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await state.set_state(ClaimRepair.train_number)
-    trains = load_train_list()
-    if not trains:
+    catalog = get_train_catalog()
+    if not len(catalog):
         await callback.message.answer("❌ Список поездов пуст или не найден.")
         return
-    await state.update_data(trains=trains, page=0)
+    await state.update_data(catalog_version=catalog.version, page=0)
     await callback.message.answer("🔧 Вы выбрали: Восстановление работоспособности")
     await show_train_page(callback, state, 0)
     await callback.answer()
@@ -140,7 +137,7 @@ async def handle_restoration(callback: CallbackQuery, state: FSMContext):
 async def navigate_pages(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     page = int(callback.data.split("_")[-1])
-    total_pages = (len(data.get("trains", [])) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
+    total_pages = get_train_catalog(data.get("catalog_version")).pages(ITEMS_PER_PAGE)
     if 0 <= page < total_pages:
         await state.update_data(page=page)
         await show_train_page(callback, state, page)
@@ -167,11 +164,10 @@ async def select_train(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(ClaimRepair.train_number)
+@router.message(ClaimRepair.train_number, flags={"throttle": "search"})
 async def search_train(message: Message, state: FSMContext):
-    query = message.text.strip().upper()
-    trains = load_train_list()
-    results = [t for t in trains if t.upper().startswith(query)]
+    query = message.text.strip()
+    results = get_train_catalog().search(query, limit=10)
     if not results:
         await message.answer("❌ По вашему запросу поездов не найдено.")
         return
@@ -179,13 +175,13 @@ async def search_train(message: Message, state: FSMContext):
         "Выберите поезд из результатов поиска:",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text=train, callback_data=f"train_{train}")]
-            for train in results[:10]
+            for train in results
         ])
     )
 
 
 @router.message(ClaimRepair.wagon_number)
-async def repair_wagon_sn(message: Message, state: FSMContext):
+async def repair_wagon_number(message: Message, state: FSMContext):
     def validate_wagon(value: str) -> bool:
         if not value.isdigit():
             return False
@@ -206,24 +202,26 @@ async def repair_wagon_sn(message: Message, state: FSMContext):
 
 @router.message(ClaimRepair.wagon_sn)
 async def repair_wagon_sn(message: Message, state: FSMContext):
-    raw_input = message.text.strip()
-    if ' ' not in raw_input:
-        if len(raw_input) == 8:
-            wagon_sn = f"{raw_input[:3]} {raw_input[3:]}"
-        else:
-            await message.answer(
-                "❌ Неверная длина серийного номера.\n"
-                "Введите 8 символов (например: 1123456), или с пробелом: 112 13456."
-            )
-            return
-    else:
-        wagon_sn = raw_input
+    [result] = await validate_serials([message.text.strip()])
+    if result["wagon_sn"] is None:
+        await message.answer(
+            "❌ Неверная длина серийного номера.\n"
+            "Введите 8 символов (например: 11213456), или с пробелом: 112 13456."
+        )
+        return
 
+    wagon_sn = result["wagon_sn"]
     await state.update_data(wagon_sn=wagon_sn)
     logger.info(f"State data after wagon_sn update: {await state.get_data()}")
 
-    if not await is_wagon_sn_valid(wagon_sn):
-        await message.answer("❌ Вагон с таким серийным номером не найден в базе.\nПроверьте правильность ввода.")
+    if not result["found"]:
+        hint = f"\nВозможно, вы имели в виду: {', '.join(result['suggestions'])}" if result["suggestions"] else ""
+        await message.answer(
+            "❌ Вагон с таким серийным номером не найден в базе.\nПроверьте правильность ввода." + hint
+        )
+        return
+    if not result["active"]:
+        await message.answer("❌ Вагон с таким серийным номером выведен из эксплуатации (не активен).")
         return
 
     await message.answer(f"✅ Серийный номер вагона: {wagon_sn}")
@@ -349,7 +347,7 @@ async def repair_executor_position(message: Message, state: FSMContext):
     await show_repair_summary(message, state)
 
 
-@router.callback_query(F.data == "create_repair_claim", ClaimRepair.confirmation)
+@router.callback_query(F.data == "create_repair_claim", ClaimRepair.confirmation, flags={"throttle": "claim", "idempotent": True})
 async def finish_repair(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     logger.info("Начинаем создание заявки в GLPI", extra={"data": data})
@@ -364,47 +362,48 @@ async def finish_repair(callback: CallbackQuery, state: FSMContext):
     if manual_problem and OTHER_OPTION_INDEX in selected_indices:
         problem_types.append(manual_problem)
 
+    # Номер заявки возвращается middleware идемпотентности (повторные нажатия)
+    ticket_id = None
     try:
-        with connect(config.GLPI_URL, config.GLPI_APP_TOKEN, config.GLPI_USER_TOKEN, False) as glpi:
-            logger.debug("Успешно подключились к GLPI API")
-            content = (
-                f"Заявка создана через Telegram\n"
-                "#телеграм\n"
-                f"Поезд: {data['train_number']}\n"
-                f"Вагон: {data['wagon_number']}\n"
-                f"Серийный номер вагона: {data['wagon_sn']}\n"
-                f"Проблемы: {', '.join(data['problem_types'])}\n"
-                f"Заявитель: {data['executor_name']}"
-            )
-            ticket_data = {
-                "name": "API GLPI - Восстановление работы",
-                "content": content,
-                "urgency": 4,
-                "impact": 4,
-                "priority": 4,
-                "type": 1,
-                "requesttypes_id": 8,
-                "itilcategories_id": 39,
-                "entities_id": 16,
-                "_users_id_observer": [22]
-            }
-            logger.debug("Отправляем данные в GLPI", extra={"ticket_data": ticket_data})
-            ticket_result = glpi.add("Ticket", ticket_data)
-            ticket_id = ticket_result[0]['id']
-            logger.info(f"Заявка успешно создана в GLPI", extra={"ticket_id": ticket_id})
-            await callback.message.answer(
-                f"✅ Заявка №{ticket_id} успешно создана в GLPI!\n"
-                f"Поезд: {data['train_number']}\n"
-                f"Вагон: {data['wagon_number']}\n"
-                f"Серийный номер вагона: {data['wagon_sn']}",
-                reply_markup=get_return_main_menu_kb()
-            )
-            await state.clear()
+        content = (
+            f"Заявка создана через Telegram\n"
+            "#телеграм\n"
+            f"Поезд: {data['train_number']}\n"
+            f"Вагон: {data['wagon_number']}\n"
+            f"Серийный номер вагона: {data['wagon_sn']}\n"
+            f"{format_wagon_attributes(data['wagon_sn'])}"
+            f"Проблемы: {', '.join(data['problem_types'])}\n"
+            f"Заявитель: {data['executor_name']}"
+        )
+        ticket_data = {
+            "name": "API GLPI - Восстановление работы",
+            "content": content,
+            "urgency": 4,
+            "impact": 4,
+            "priority": 4,
+            "type": 1,
+            "requesttypes_id": 8,
+            "itilcategories_id": 39,
+            "entities_id": 16,
+            "_users_id_observer": [22]
+        }
+        logger.debug("Отправляем данные в GLPI", extra={"ticket_data": ticket_data})
+        ticket_id = await ticket_writer.submit(ticket_data)
+        logger.info(f"Заявка успешно создана в GLPI", extra={"ticket_id": ticket_id})
+        await callback.message.answer(
+            f"✅ Заявка №{ticket_id} успешно создана в GLPI!\n"
+            f"Поезд: {data['train_number']}\n"
+            f"Вагон: {data['wagon_number']}\n"
+            f"Серийный номер вагона: {data['wagon_sn']}",
+            reply_markup=get_return_main_menu_kb()
+        )
+        await state.clear()
     except Exception as e:
         logger.error("Ошибка при создании заявки в GLPI", exc_info=True)
         await callback.message.answer(f"❌ Произошла ошибка при создании заявки: {e}")
         await state.clear()
     await callback.answer()
+    return ticket_id
 
 
 def validate_executor_name(name: str) -> bool:
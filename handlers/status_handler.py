@@ -1,11 +1,15 @@
+import html
+import logging
+
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
 
-import config
-from glpi_api import connect
 from keyboards.inline_kb import get_main_menu_kb, get_retry_or_main_menu_kb
+from utils.ticket_cache import ticket_cache
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -22,7 +26,7 @@ async def request_ticket_id(message: Message, state: FSMContext):
 
 
 # === Получение ID и запрос в GLPI ===
-@router.message(StatusCheck.ticket_id)
+@router.message(StatusCheck.ticket_id, flags={"throttle": "status", "glpi": True})
 async def get_ticket_status(message: Message, state: FSMContext):
     ticket_id = message.text.strip()
 
@@ -31,49 +35,59 @@ async def get_ticket_status(message: Message, state: FSMContext):
         return
 
     try:
-        with connect(config.GLPI_URL, config.GLPI_APP_TOKEN, config.GLPI_USER_TOKEN) as glpi:
-            ticket = glpi.get_item("Ticket", int(ticket_id))
-
-            if ticket is None:
-                await message.answer(
-                    f"❌ Заявка с номером {ticket_id} не найдена.",
-                    reply_markup=get_retry_or_main_menu_kb()
-                )
-                return
-
-            # Получаем основные поля заявки
-            status_id = ticket.get('status', '')
-            status_map = {
-                '1': 'Новая',
-                '2': 'В обработке (назначено)',
-                '3': 'В обработке (планируется)',
-                '4': 'Ожидание',
-                '5': 'Закрыто',
-                '6': 'Отменено',
-                '7': 'Прочее'
-            }
-            status_name = status_map.get(str(status_id), 'Неизвестно')
-
-            content = ticket.get('content', 'Нет описания')
-            name = ticket.get('name', 'Без названия')
-            date_creation = ticket.get('date', 'Не указана')
-
-            # Отправляем информацию пользователю
-            response = (
-                f"📄 <b>Информация по заявке #{ticket_id}</b>\n\n"
-                f"📌 Тема: {name}\n"
-                f"📅 Создано: {date_creation}\n"
-                f"✅ Статус: {status_name}\n"
-                f"📝 Описание: {content}..."
+        # Повторные проверки той же заявки отвечаются из кэша,
+        # GLPI опрашивается только если заявка могла измениться
+        info = await ticket_cache.get(int(ticket_id))
+
+        if info is None:
+            await message.answer(
+                f"❌ Заявка с номером {ticket_id} не найдена.",
+                reply_markup=get_retry_or_main_menu_kb()
             )
-            await message.answer(response, parse_mode="HTML", reply_markup=get_retry_or_main_menu_kb())
+            return
+
+        # Получаем основные поля заявки
+        ticket = info["ticket"]
+        status_id = ticket.get('status', '')
+        status_map = {
+            '1': 'Новая',
+            '2': 'В обработке (назначено)',
+            '3': 'В обработке (планируется)',
+            '4': 'Ожидание',
+            '5': 'Закрыто',
+            '6': 'Отменено',
+            '7': 'Прочее'
+        }
+        status_name = status_map.get(str(status_id), 'Неизвестно')
+
+        content = ticket.get('content', 'Нет описания')
+        # Названия из GLPI экранируются: сообщение отправляется с разметкой HTML
+        name = html.escape(ticket.get('name') or 'Без названия')
+        date_creation = ticket.get('date', 'Не указана')
+
+        category = html.escape(info["category"] or 'Не указана')
+        entity = html.escape(info["entity"] or 'Не указана')
+        assigned = html.escape(", ".join(info["assigned"]) or 'Не назначен')
+
+        # Отправляем информацию пользователю
+        response = (
+            f"📄 <b>Информация по заявке #{ticket_id}</b>\n\n"
+            f"📌 Тема: {name}\n"
+            f"📅 Создано: {date_creation}\n"
+            f"✅ Статус: {status_name}\n"
+            f"🗂 Категория: {category}\n"
+            f"🏢 Организация: {entity}\n"
+            f"👷 Исполнитель: {assigned}\n"
+            f"📝 Описание: {content}..."
+        )
+        await message.answer(response, parse_mode="HTML", reply_markup=get_retry_or_main_menu_kb())
 
     except Exception as e:
         await message.answer(
             "❌ Не удалось получить данные из GLPI.",
             reply_markup=get_retry_or_main_menu_kb()
         )
-        print("Ошибка при получении заявки:", e)
+        logger.error(f"Ошибка при получении заявки {ticket_id}: {e}", exc_info=True)
         return
 
     finally:
@@ -12,6 +12,15 @@ from handlers.status_handler import router as status_router
 from edit.edit_repairClaim import router as edit_router
 from edit.edit_renewalV1Claim import router as renewal_edit_router
 from edit.edit_renewalV2Claim import router as renewalV2_edit_router
+from utils.glpi_client import glpi_pool, warm_dropdowns
+from utils.ticket_writer import ticket_writer
+from utils.ticket_cache import ticket_cache
+from utils.reference_data import reference_data
+from utils.static_assets import static_assets
+from utils.fsm_storage import build_fsm_storage
+from middlewares.fsm_transaction import fsm_transaction
+from middlewares.idempotency import idempotency, recent_submissions
+from middlewares.throttling import throttling
 
 
 
@@ -19,25 +28,87 @@ from edit.edit_renewalV2Claim import router as renewalV2_edit_router
 # === Логирование ===
 logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
-# === Бот и диспетчер ===
-bot = Bot(token=config.BOT_TOKEN)
-dp = Dispatcher()
+# === Диспетчер ===
+def build_dispatcher() -> Dispatcher:
+    """Создаёт диспетчер с роутерами и обработчиками запуска/остановки (один раз на процесс)."""
+    dp = Dispatcher(storage=build_fsm_storage())
+    # Одно чтение и одна запись состояния FSM на обновление (после FSM-middleware aiogram)
+    dp.update.outer_middleware(fsm_transaction)
+    # Повторное нажатие «Создать заявку» не создаёт вторую заявку; подключается
+    # раньше ограничения частоты, чтобы повторы не расходовали лимит пользователя
+    dp.callback_query.middleware(idempotency)
+    # Поздние повторы после очистки состояния не проходят фильтры обработчика —
+    # их номер заявки проверяется до выбора обработчика
+    dp.callback_query.outer_middleware(recent_submissions)
+    # Ограничение частоты по пользователям и одновременных обращений к GLPI (флаги обработчиков)
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
 
-# Подключаем роутеры
-dp.include_router(general_router)
-dp.include_router(repair_router)
-dp.include_router(status_router)
-# dp.include_router(renewal_router)
-# dp.include_router(renewalV2_router)
-# dp.include_router(renewal_edit_router)
-# dp.include_router(renewalV2_edit_router)
-dp.include_router(edit_router)
+    # Подключаем роутеры
+    dp.include_router(general_router)
+    dp.include_router(repair_router)
+    dp.include_router(status_router)
+    # dp.include_router(renewal_router)
+    # dp.include_router(renewalV2_router)
+    # dp.include_router(renewal_edit_router)
+    # dp.include_router(renewalV2_edit_router)
+    dp.include_router(edit_router)
 
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+
+async def warm_up():
+    """
+    Прогрев после старта: сессии GLPI, поезда и вагоны, справочники загружаются
+    в фоне, чтобы бот начал принимать обновления сразу. Обработчики, пришедшие
+    раньше, дождутся нужного ресурса сами (пул и реестр загружаются лениво).
+    """
+    try:
+        await glpi_pool.start()
+    except Exception as e:
+        logging.error(f"Не удалось открыть сессии GLPI при старте: {e}")
+    # Поезда и вагоны загружаются один раз и дальше обновляются в фоне
+    await reference_data.start()
+    await warm_dropdowns()
+
+
+# Пул сессий GLPI и очередь заявок запускаются при старте и закрываются при остановке бота
+async def on_startup(dispatcher: Dispatcher):
+    await ticket_writer.start()
+    dispatcher["warm_up_task"] = asyncio.create_task(warm_up())
+
+
+async def on_shutdown(dispatcher: Dispatcher):
+    dispatcher["warm_up_task"].cancel()
+    await reference_data.stop()
+    await ticket_writer.stop()
+    logging.info(f"Статистика очереди заявок: {ticket_writer.stats()}")
+    logging.info(f"Статистика кэша заявок: {ticket_cache.stats()}")
+    logging.info(f"Статистика отправки файлов: {static_assets.stats()}")
+    logging.info(f"Статистика обращений к FSM: {fsm_transaction.stats()}")
+    logging.info(f"Статистика ограничения запросов: {throttling.stats()}")
+    logging.info(f"Статистика повторных отправок заявок: {idempotency.stats()}")
+    logging.info(f"Статистика пула сессий GLPI: {glpi_pool.stats()}")
+    await glpi_pool.close()
 
 
 # Запуск бота
 async def main():
-    await dp.start_polling(bot)
+    bot = Bot(token=config.BOT_TOKEN)
+    if config.BOT_WORKERS > 1:
+        # Обновления распределяются по чатам между процессами-обработчиками
+        from utils.workers import run_sharded
+        await run_sharded(bot, config.BOT_WORKERS)
+        return
+    dp = build_dispatcher()
+    if config.BOT_MODE == "webhook":
+        # aiohttp и обработчик вебхука нужны только в этом режиме
+        from utils.webhook import run_webhook
+        await run_webhook(bot, dp)
+    else:
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+# middlewares/fsm_transaction.py
+"""
+Состояние FSM как транзакция на время обработки одного обновления.
+
+Обработчики обращаются к FSM много раз за сообщение (update_data, затем
+get_data для лога, снова get_data, set_state...). С хранилищем на диске
+(utils/fsm_storage.py) каждое обращение — это поход в хранилище. Middleware
+подменяет FSMContext обработчика на TransactionalFSMContext:
+    — состояние берётся из уже прочитанного aiogram raw_state, данные читаются
+      из хранилища один раз при первом обращении;
+    — все изменения выполняются в памяти;
+    — после обработки (в том числе при ошибке) в хранилище записываются одно
+      итоговое состояние и один набор данных, если они изменились.
+Диспетчер не блокирует состояние на время обработки (events_isolation по
+умолчанию), поэтому обновления одного пользователя могут обрабатываться
+одновременно. Чтобы они не затирали изменения друг друга, при записи
+update_data данные заново читаются из хранилища и в них переносятся только
+изменённые ключи; set_data и clear заменяют данные целиком, как и без middleware.
+Счётчики обращений обработчиков и реальных обращений к хранилищу пишутся в лог
+(DEBUG) для каждого обновления и суммарно при остановке.
+"""
+import logging
+from copy import copy
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class TransactionalFSMContext(FSMContext):
+    """FSMContext, который читает хранилище один раз и записывает изменения в `commit`."""
+
+    def __init__(self, context: FSMContext, raw_state=_UNSET):
+        super().__init__(storage=context.storage, key=context.key)
+        self._state = raw_state
+        self._data = None
+        self._state_changed = False
+        # Ключи, изменённые update_data, и признак полной замены данных (set_data)
+        self._changed_keys = set()
+        self._data_replaced = False
+        # Обращения обработчиков и обращения к хранилищу
+        self.reads = 0
+        self.writes = 0
+        self.storage_reads = 0
+        self.storage_writes = 0
+
+    async def _load_data(self) -> dict:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+            self.storage_reads += 1
+        return self._data
+
+    async def set_state(self, state=None) -> None:
+        self.writes += 1
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def get_state(self):
+        self.reads += 1
+        if self._state is _UNSET:
+            self._state = await self.storage.get_state(key=self.key)
+            self.storage_reads += 1
+        return self._state
+
+    async def set_data(self, data) -> None:
+        self.writes += 1
+        self._data = data.copy()
+        self._data_replaced = True
+        self._changed_keys.clear()
+
+    async def get_data(self) -> dict:
+        self.reads += 1
+        return (await self._load_data()).copy()
+
+    async def get_value(self, key, default=None):
+        self.reads += 1
+        return copy((await self._load_data()).get(key, default))
+
+    async def update_data(self, data=None, **kwargs) -> dict:
+        if data:
+            kwargs.update(data)
+        self.writes += 1
+        current = await self._load_data()
+        current.update(kwargs)
+        self._changed_keys.update(kwargs)
+        return current.copy()
+
+    async def clear(self) -> None:
+        await self.set_state(None)
+        await self.set_data({})
+
+    async def commit(self):
+        """Записывает в хранилище изменившиеся состояние и данные."""
+        if self._state_changed:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self.storage_writes += 1
+            self._state_changed = False
+        if self._data_replaced:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self.storage_writes += 1
+        elif self._changed_keys:
+            # Изменения других обновлений, записанные за время обработки, сохраняются
+            data = await self.storage.get_data(key=self.key)
+            self.storage_reads += 1
+            data.update({name: self._data[name] for name in self._changed_keys})
+            await self.storage.set_data(key=self.key, data=data)
+            self.storage_writes += 1
+        self._data_replaced = False
+        self._changed_keys.clear()
+
+
+class FSMTransactionMiddleware(BaseMiddleware):
+    """
+    Outer-middleware обновлений: подключается после FSMContextMiddleware
+    aiogram (dp.update.outer_middleware), который кладёт в data state и raw_state.
+    """
+
+    def __init__(self):
+        self._updates = 0
+        self._reads = 0
+        self._writes = 0
+        self._storage_reads = 0
+        self._storage_writes = 0
+
+    async def __call__(self, handler, event, data):
+        context = data.get("state")
+        if context is None:
+            return await handler(event, data)
+
+        transaction = TransactionalFSMContext(context, data.get("raw_state", _UNSET))
+        data["state"] = transaction
+        try:
+            return await handler(event, data)
+        finally:
+            await transaction.commit()
+            self._updates += 1
+            self._reads += transaction.reads
+            self._writes += transaction.writes
+            self._storage_reads += transaction.storage_reads
+            self._storage_writes += transaction.storage_writes
+            logger.debug(
+                f"FSM {context.key.chat_id}:{context.key.user_id}: "
+                f"чтений {transaction.reads} (из хранилища {transaction.storage_reads}), "
+                f"записей {transaction.writes} (в хранилище {transaction.storage_writes})"
+            )
+
+    def stats(self) -> dict:
+        """Обращения обработчиков к FSM и реальные обращения к хранилищу за всё время."""
+        return {
+            "updates": self._updates,
+            "reads": self._reads,
+            "writes": self._writes,
+            "storage_reads": self._storage_reads,
+            "storage_writes": self._storage_writes,
+        }
+
+
+fsm_transaction = FSMTransactionMiddleware()
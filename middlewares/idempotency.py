@@ -0,0 +1,173 @@
+# middlewares/idempotency.py
+"""
+Защита от повторной отправки заявки (двойное нажатие «Создать заявку»).
+
+Обработчик создания заявки помечается флагом и возвращает номер созданной заявки:
+
+    @router.callback_query(F.data == "create_repair_claim", ClaimRepair.confirmation,
+                           flags={"idempotent": True})
+
+Ключ отправки — sha256 снимка заявки: пользователь, состояние FSM, данные FSM
+и нажатая кнопка. Middleware:
+    — пока у пользователя выполняется отправка с тем же ключом, повторное
+      нажатие не запускает обработчик, а ждёт первую отправку и сообщает номер
+      её заявки;
+    — отправки одного пользователя с разными снимками выполняются по очереди;
+    — номер заявки запоминается на IDEMPOTENCY_TTL сек по нажатой кнопке:
+      пользователь, сообщение с кнопкой и данные callback.
+После отправки обработчик очищает состояние FSM, и поздний повтор уже не
+проходит фильтр состояния. Поэтому запомненные нажатия проверяет отдельный
+outer-middleware (до выбора обработчика): повтор не создаёт вторую заявку,
+а пользователь получает номер созданной.
+Неудачная отправка (обработчик вернул None) не запоминается, её можно повторить.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message
+
+import config
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_TEXT = "✅ Заявка №{ticket_id} уже создана."
+
+
+def submission_key(user_id, raw_state, fsm_data: dict, event) -> str:
+    """Ключ идемпотентности отправки по снимку заявки."""
+    snapshot = {
+        "user": user_id,
+        "state": raw_state,
+        "data": fsm_data,
+        "action": event.data if isinstance(event, CallbackQuery) else getattr(event, "text", None),
+    }
+    encoded = json.dumps(snapshot, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def callback_key(user_id, callback: CallbackQuery):
+    """Ключ нажатой кнопки: новая заявка подтверждается в новом сообщении."""
+    message = callback.message
+    message_id = (message.chat.id, message.message_id) if message is not None else None
+    return user_id, message_id, callback.data
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """Одна отправка заявки на снимок и отправки пользователя по очереди."""
+
+    def __init__(self, ttl=120.0, max_size=4096):
+        self.ttl = ttl
+        self.max_size = max_size
+        # user_id -> (ключ, future с номером заявки) выполняющейся отправки
+        self._inflight = {}
+        # ключ нажатой кнопки -> (номер заявки, время создания)
+        self._recent = OrderedDict()
+        # Статистика
+        self._submitted = 0
+        self._joined = 0
+        self._suppressed = 0
+
+    def _recent_ticket(self, key):
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        ticket_id, created = entry
+        if time.monotonic() - created > self.ttl:
+            del self._recent[key]
+            return None
+        return ticket_id
+
+    def _remember(self, key, ticket_id):
+        self._recent[key] = (ticket_id, time.monotonic())
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
+
+    @staticmethod
+    async def _reply(event, text):
+        if isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer(text)
+
+    async def _duplicate(self, event, ticket_id):
+        if ticket_id is not None:
+            logger.info(f"Повторная отправка заявки №{ticket_id} не выполнена")
+            await self._reply(event, DUPLICATE_TEXT.format(ticket_id=ticket_id))
+        elif isinstance(event, CallbackQuery):
+            # Первая отправка не удалась и уже сообщила об ошибке
+            await event.answer()
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        state = data.get("state")
+        if not get_flag(data, "idempotent", default=False) or user is None or state is None:
+            return await handler(event, data)
+
+        key = submission_key(user.id, data.get("raw_state"), await state.get_data(), event)
+        while True:
+            inflight = self._inflight.get(user.id)
+            if inflight is None:
+                break
+            inflight_key, future = inflight
+            if inflight_key == key:
+                # Тот же снимок: ждём первую отправку и отвечаем её результатом
+                self._joined += 1
+                ticket_id = await asyncio.shield(future)
+                await self._duplicate(event, ticket_id)
+                return ticket_id
+            # Другая заявка пользователя ещё отправляется — дожидаемся её
+            await asyncio.wait([future])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user.id] = (key, future)
+        self._submitted += 1
+        ticket_id = None
+        try:
+            ticket_id = await handler(event, data)
+            if ticket_id is not None and isinstance(event, CallbackQuery):
+                self._remember(callback_key(user.id, event), ticket_id)
+            return ticket_id
+        finally:
+            future.set_result(ticket_id)
+            del self._inflight[user.id]
+
+    async def check_recent(self, handler, event, data):
+        """Отвечает на повторное нажатие уже отправленной кнопки номером заявки."""
+        user = data.get("event_from_user")
+        if user is not None and isinstance(event, CallbackQuery):
+            ticket_id = self._recent_ticket(callback_key(user.id, event))
+            if ticket_id is not None:
+                self._suppressed += 1
+                await self._duplicate(event, ticket_id)
+                return ticket_id
+        return await handler(event, data)
+
+    def stats(self) -> dict:
+        """Выполненные отправки, повторы, дождавшиеся первой отправки, и повторы, отклонённые по кэшу."""
+        return {
+            "submitted": self._submitted,
+            "joined": self._joined,
+            "suppressed": self._suppressed,
+            "recent": len(self._recent),
+        }
+
+
+class RecentSubmissionMiddleware(BaseMiddleware):
+    """Outer-middleware: повторы уже созданных заявок отсекаются до фильтров состояния."""
+
+    def __init__(self, idempotency: IdempotencyMiddleware):
+        self.idempotency = idempotency
+
+    async def __call__(self, handler, event, data):
+        return await self.idempotency.check_recent(handler, event, data)
+
+
+idempotency = IdempotencyMiddleware(ttl=config.IDEMPOTENCY_TTL)
+recent_submissions = RecentSubmissionMiddleware(idempotency)
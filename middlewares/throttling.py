@@ -0,0 +1,155 @@
+# middlewares/throttling.py
+"""
+Ограничение частоты запросов пользователя и нагрузки на GLPI.
+
+Middleware подключается к сообщениям и callback-запросам диспетчера (inner,
+то есть после выбора обработчика) и читает флаги обработчика:
+
+    @router.message(StatusCheck.ticket_id, flags={"throttle": "status", "glpi": True})
+
+    throttle — класс ограничения (search, status, claim); без флага действует
+               класс default. У каждого пользователя своё «ведро» токенов на
+               каждый класс: запрос забирает токен, токены восстанавливаются
+               со скоростью rate в секунду до burst;
+    glpi     — обработчик обращается к GLPI: одновременно таких обработчиков
+               выполняется не больше THROTTLE_GLPI_CONCURRENCY. Создание заявок
+               флагом не помечается: заявки ждут в очереди ticket_writer и
+               отправляются пачками, число отправок ограничено пулом сессий GLPI.
+
+Лишний запрос не ставится в очередь: пользователь сразу получает короткий
+ответ (для callback — всплывающее уведомление), а отказ учитывается в статистике.
+О превышении частоты сообщение отправляется один раз, пока ведро не восстановится.
+"""
+import asyncio
+import logging
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message
+
+import config
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_TEXT = "⏳ Слишком много запросов. Подождите несколько секунд и повторите."
+GLPI_BUSY_TEXT = "⏳ Система заявок сейчас перегружена. Повторите через минуту."
+
+
+class TokenBucket:
+    """Ведро токенов: `burst` запросов подряд, затем `rate` запросов в секунду."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "notified")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # Пользователь уже получил сообщение о превышении частоты
+        self.notified = False
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.notified = False
+            return True
+        return False
+
+    def full(self, now) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничения по пользователям и классам обработчиков, общий лимит GLPI."""
+
+    def __init__(self, limits: dict, glpi_concurrency: int, max_buckets=10000):
+        # класс -> (rate, burst)
+        self.limits = limits
+        self.max_buckets = max_buckets
+        self._glpi = asyncio.Semaphore(glpi_concurrency)
+        # (user_id, класс) -> TokenBucket
+        self._buckets = {}
+        # Статистика
+        self._passed = 0
+        self._rejected = {name: 0 for name in limits}
+        self._glpi_busy = 0
+
+    def _bucket(self, user_id, name) -> TokenBucket:
+        bucket = self._buckets.get((user_id, name))
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune()
+            bucket = self._buckets[(user_id, name)] = TokenBucket(*self.limits[name])
+        return bucket
+
+    def _prune(self):
+        # Полное ведро ничем не отличается от нового
+        now = time.monotonic()
+        for key in [key for key, bucket in self._buckets.items() if bucket.full(now)]:
+            del self._buckets[key]
+
+    @staticmethod
+    async def _reply(event, text):
+        if isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer(text)
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        name = get_flag(data, "throttle", default="default")
+        if name not in self.limits:
+            logger.warning(f"Неизвестный класс ограничения {name!r}, используется default")
+            name = "default"
+
+        if user is not None:
+            bucket = self._bucket(user.id, name)
+            if not bucket.take():
+                self._rejected[name] += 1
+                logger.info(f"Пользователь {user.id} превысил частоту запросов ({name})")
+                if not bucket.notified:
+                    bucket.notified = True
+                    await self._reply(event, RATE_LIMITED_TEXT)
+                elif isinstance(event, CallbackQuery):
+                    # Без ответа у кнопки продолжает крутиться индикатор загрузки
+                    await event.answer()
+                return None
+
+        if not get_flag(data, "glpi", default=False):
+            self._passed += 1
+            return await handler(event, data)
+
+        if self._glpi.locked():
+            self._glpi_busy += 1
+            logger.warning("Достигнут предел одновременных обращений к GLPI, запрос отклонён")
+            await self._reply(event, GLPI_BUSY_TEXT)
+            return None
+        async with self._glpi:
+            self._passed += 1
+            return await handler(event, data)
+
+    def stats(self) -> dict:
+        """Пропущенные обновления, отказы по классам и отказы из-за занятости GLPI."""
+        return {
+            "passed": self._passed,
+            "rejected": dict(self._rejected),
+            "glpi_busy": self._glpi_busy,
+            "buckets": len(self._buckets),
+        }
+
+
+throttling = ThrottlingMiddleware(
+    {
+        "default": (config.THROTTLE_RATE, config.THROTTLE_BURST),
+        "search": (config.THROTTLE_SEARCH_RATE, config.THROTTLE_SEARCH_BURST),
+        "status": (config.THROTTLE_STATUS_RATE, config.THROTTLE_STATUS_BURST),
+        "claim": (config.THROTTLE_CLAIM_RATE, config.THROTTLE_CLAIM_BURST),
+    },
+    glpi_concurrency=config.THROTTLE_GLPI_CONCURRENCY,
+)
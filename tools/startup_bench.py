@@ -0,0 +1,179 @@
+# tools/startup_bench.py
+"""
+Замер времени запуска бота: стоимость импортов и время до обработки первого обновления.
+
+    python tools/startup_bench.py [--runs 3] [--top 15]
+
+1. `python -X importtime -c "import main"` — суммарное время импорта main и
+   самые дорогие пакеты. Тяжёлые зависимости (pandas, openpyxl, bs4, requests)
+   не должны загружаться при старте, их появление считается регрессией.
+2. Время до первого обновления: отдельный процесс импортирует main, собирает
+   диспетчер (main.build_dispatcher), выполняет обработчики запуска и обрабатывает
+   команду /start через dp.feed_update. Запросы к Telegram уходят в заглушку,
+   GLPI недоступен, так что меряется только работа самого бота.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "openpyxl", "bs4", "requests")
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "42:BENCHMARK")
+    # Недоступный адрес: прогрев GLPI в фоне сразу получает отказ соединения
+    env.setdefault("GLPI_URL", "http://127.0.0.1:9/apirest.php")
+    env.setdefault("GLPI_APP_TOKEN", "benchmark")
+    env.setdefault("GLPI_USER_TOKEN", "benchmark")
+    # Состояния FSM замера не смешиваются с состояниями бота
+    env.setdefault("FSM_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "startup_bench_fsm.sqlite3"))
+    env["BENCH_SPAWNED_AT"] = repr(time.time())
+    return env
+
+
+def import_costs():
+    """Разбирает вывод -X importtime: (время импорта main, {пакет: собственное время}, модули)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    total = 0
+    packages = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        name = name.strip()
+        modules.add(name)
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+        if name == "main":
+            total = cumulative_us
+    return total, packages, modules
+
+
+async def first_update():
+    """Выполняется в дочернем процессе: время этапов до ответа на первое обновление."""
+    spawned_at = float(os.environ["BENCH_SPAWNED_AT"])
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Update
+
+    import main
+
+    imported = time.perf_counter()
+
+    class StubSession(BaseSession):
+        """Сессия без сети: запоминает вызовы методов Bot API."""
+
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls.append(type(method).__name__)
+            return None
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536,
+                                 raise_for_status=True):
+            if False:
+                yield b""
+
+        async def close(self):
+            pass
+
+    session = StubSession()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = main.build_dispatcher()
+    built = time.perf_counter()
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot])
+    started_up = time.perf_counter()
+
+    update = Update.model_validate({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Bench"},
+            "text": "/start",
+        },
+    }, context={"bot": bot})
+    await dp.feed_update(bot, update)
+    handled = time.perf_counter()
+    answered = time.time()
+
+    await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot])
+    print(json.dumps({
+        "import": imported - started,
+        "build": built - imported,
+        "startup": started_up - built,
+        "first_update": handled - started_up,
+        "spawn_to_first_update": answered - spawned_at,
+        "bot_calls": session.calls,
+        "heavy_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def run_child():
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Дочерний процесс завершился с кодом {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="число запусков (берётся медиана)")
+    parser.add_argument("--top", type=int, default=15, help="сколько пакетов показать")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import asyncio
+        asyncio.run(first_update())
+        return 0
+
+    total, packages, modules = import_costs()
+    print(f"Импорт main: {total / 1000:.1f} мс")
+    print("Самые дорогие пакеты (собственное время импорта):")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<30} {self_us / 1000:8.1f} мс")
+
+    runs = [run_child() for _ in range(args.runs)]
+    print(f"\nДо первого обновления (медиана из {len(runs)}):")
+    for key in ("import", "build", "startup", "first_update", "spawn_to_first_update"):
+        print(f"  {key:<24} {statistics.median(run[key] for run in runs) * 1000:8.1f} мс")
+    print(f"  вызовы Bot API: {runs[-1]['bot_calls']}")
+
+    heavy = sorted({name for name in HEAVY_MODULES if name in modules}
+                   | {name for run in runs for name in run["heavy_loaded"]})
+    if heavy:
+        print(f"\n❌ При запуске загружены тяжёлые зависимости: {', '.join(heavy)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# tools/webhook_selftest.py
+"""
+Самопроверка режима вебхука: отправляет синтетические обновления POST-запросами.
+
+    python tools/webhook_selftest.py [--updates 200] [--concurrency 50]
+    python tools/webhook_selftest.py --url http://127.0.0.1:8080/webhook --secret ...
+
+Без --url поднимает в этом процессе приложение вебхука (utils.webhook.build_webhook_app)
+на свободном порту: запросы к Telegram уходят в заглушку, GLPI недоступен.
+С --url отправляет обновления уже запущенному боту (BOT_MODE=webhook) — в этом
+случае бот действительно ответит в чаты из обновлений, поэтому укажите --chat-id
+своего тестового чата (все обновления одного чата подпадают под ограничение
+частоты запросов бота, THROTTLE_RATE/THROTTLE_BURST).
+
+Проверяется:
+    1. запрос с неверным секретом отклоняется (401);
+    2. N обновлений /start принимаются (200) — время ответа вебхука;
+    3. (без --url) все обновления обработаны — время до последнего ответа бота.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_update(update_id, chat_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Selftest"},
+            "text": "/start",
+        },
+    }
+
+
+async def post_updates(url, secret, updates, concurrency):
+    """Отправляет обновления, возвращает (коды ответов, задержки в сек)."""
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses, latencies = [], []
+
+    async def post(session, update):
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.post(url, json=update,
+                                    headers={"X-Telegram-Bot-Api-Secret-Token": secret}) as response:
+                await response.read()
+                statuses.append(response.status)
+            latencies.append(time.perf_counter() - started)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(post(session, update) for update in updates))
+    return statuses, latencies
+
+
+async def start_local_app(secret):
+    """Приложение вебхука с заглушкой Bot API на свободном порту: (url, runner, вызовы Bot API)."""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    os.environ.setdefault("BOT_TOKEN", "42:SELFTEST")
+    # Недоступный адрес: прогрев GLPI в фоне сразу получает отказ соединения
+    os.environ.setdefault("GLPI_URL", "http://127.0.0.1:9/apirest.php")
+    # Состояния FSM самопроверки не смешиваются с состояниями бота
+    os.environ.setdefault("FSM_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "webhook_selftest_fsm.sqlite3"))
+
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiohttp import web
+
+    import main
+    from utils.webhook import build_webhook_app
+
+    calls = []
+
+    class StubSession(BaseSession):
+        """Сессия без сети: запоминает время вызовов методов Bot API."""
+
+        async def make_request(self, bot, method, timeout=None):
+            calls.append(time.perf_counter())
+            return None
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536,
+                                 raise_for_status=True):
+            if False:
+                yield b""
+
+        async def close(self):
+            pass
+
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=StubSession())
+    app = build_webhook_app(main.build_dispatcher(), bot, secret_token=secret, path="/webhook")
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}/webhook", runner, calls
+
+
+async def run(args):
+    local = args.url is None
+    secret = args.secret or "selftest-secret"
+    if local:
+        url, runner, calls = await start_local_app(secret)
+    else:
+        url, runner, calls = args.url, None, None
+
+    failed = False
+    try:
+        statuses, _ = await post_updates(url, "wrong-secret", [make_update(1, args.chat_id)], 1)
+        ok = statuses == [401]
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} Неверный секрет: код {statuses[0]}")
+
+        # Локально каждое обновление приходит из своего чата, чтобы ограничение
+        # частоты запросов пользователя (middlewares/throttling.py) не отклоняло их
+        chats = args.chats or (args.updates if local else 1)
+        updates = [make_update(i + 2, args.chat_id + i % chats) for i in range(args.updates)]
+        started = time.perf_counter()
+        statuses, latencies = await post_updates(url, secret, updates, args.concurrency)
+        accepted = statuses.count(200)
+        ok = accepted == len(updates)
+        failed |= not ok
+        latencies.sort()
+        print(f"{'✅' if ok else '❌'} Принято {accepted} из {len(updates)} "
+              f"(коды: {sorted(set(statuses))})")
+        print(f"   ответ вебхука: медиана {statistics.median(latencies) * 1000:.1f} мс, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} мс")
+
+        if local:
+            # /start отвечает одним сообщением: ждём ответы на все обновления
+            deadline = time.perf_counter() + args.timeout
+            while len(calls) < accepted and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+            ok = len(calls) >= accepted
+            failed |= not ok
+            if calls:
+                print(f"{'✅' if ok else '❌'} Обработано {len(calls)} обновлений, последнее через "
+                      f"{(max(calls) - started) * 1000:.1f} мс после начала отправки")
+            else:
+                print("❌ Бот не ответил ни на одно обновление")
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="адрес вебхука запущенного бота (по умолчанию — локальное приложение)")
+    parser.add_argument("--secret", help="WEBHOOK_SECRET бота (для --url)")
+    parser.add_argument("--updates", type=int, default=200, help="сколько обновлений отправить")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных запросов")
+    parser.add_argument("--chat-id", type=int, default=1, help="чат первого обновления")
+    parser.add_argument("--chats", type=int, default=0,
+                        help="по скольким чатам распределить обновления "
+                             "(по умолчанию локально — каждое в свой чат, с --url — один чат)")
+    parser.add_argument("--timeout", type=float, default=30, help="сколько ждать обработки, сек")
+    args = parser.parse_args()
+    if args.url and not args.secret:
+        parser.error("для --url нужен --secret")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
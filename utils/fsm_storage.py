@@ -0,0 +1,212 @@
+# utils/fsm_storage.py
+"""
+Хранилище FSM в локальном файле SQLite (FSM_STORAGE=sqlite): недозаполненные
+заявки переживают перезапуск бота.
+
+Чтение и запись идут через кэш в памяти (LRU на `cache_size` записей), поэтому
+обработчик не ждёт диска:
+    — set_state/set_data меняют запись в памяти и помечают её изменённой;
+    — фоновая задача раз в `flush_interval` сек записывает все изменённые
+      записи одной транзакцией в отдельном потоке, так что несколько
+      update_data за одно обновление превращаются в одну запись строки;
+    — с диска читается только запись, которой нет в кэше.
+При остановке бота (Dispatcher вызывает close) несохранённые записи сбрасываются
+на диск. База открывается в режиме WAL.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM в SQLite с кэшем в памяти и отложенной записью."""
+
+    def __init__(self, path, cache_size=4096, flush_interval=0.05):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        # Соединение используется из потоков to_thread по очереди
+        self._db_lock = threading.Lock()
+        # ключ -> [состояние, данные]
+        self._cache = OrderedDict()
+        # Изменённые, но ещё не записанные ключи
+        self._dirty = set()
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._loading = {}
+        # Статистика
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._rows_written = 0
+        self._flushes = 0
+
+    # === Кэш ===
+
+    async def _record(self, key: StorageKey) -> list:
+        name = self.key_builder.build(key)
+        record = self._cache.get(name)
+        if record is not None:
+            self._cache.move_to_end(name)
+            self._hits += 1
+            return record
+        # Одновременные обращения к одной записи читают диск один раз
+        if name not in self._loading:
+            self._misses += 1
+            self._loading[name] = asyncio.ensure_future(asyncio.to_thread(self._read, name))
+        try:
+            record = await asyncio.shield(self._loading[name])
+        finally:
+            self._loading.pop(name, None)
+        # Пока читали диск, запись могла появиться в кэше
+        return self._put(name, self._cache.get(name) or record)
+
+    def _put(self, name, record) -> list:
+        self._cache[name] = record
+        self._cache.move_to_end(name)
+        # Изменённые записи не вытесняются до записи на диск
+        while len(self._cache) > self.cache_size:
+            oldest = next(iter(self._cache))
+            if oldest in self._dirty:
+                break
+            self._cache.popitem(last=False)
+        return record
+
+    def _changed(self, key: StorageKey, record):
+        name = self.key_builder.build(key)
+        self._put(name, record)
+        self._dirty.add(name)
+        self._writes += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    # === Диск ===
+
+    def _read(self, name) -> list:
+        with self._db_lock:
+            row = self._db.execute("SELECT state, data FROM fsm WHERE key = ?", (name,)).fetchone()
+        if row is None:
+            return [None, {}]
+        return [row[0], json.loads(row[1])]
+
+    def _write(self, rows):
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                for name, state, data in rows:
+                    if state is None and data == "{}":
+                        self._db.execute("DELETE FROM fsm WHERE key = ?", (name,))
+                    else:
+                        self._db.execute(
+                            "INSERT INTO fsm (key, state, data, updated) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+                            "data = excluded.data, updated = excluded.updated",
+                            (name, state, data, time.time()),
+                        )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        # Отмена при остановке не должна прерывать уже начатую запись
+        await asyncio.shield(self.flush())
+
+    async def flush(self):
+        """Записывает изменённые записи на диск одной транзакцией."""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        # Снимок сериализуется в цикле событий: обработчики могут менять вложенные списки
+        rows = []
+        for name in dirty:
+            state, data = self._cache[name]
+            rows.append((name, state, json.dumps(data, ensure_ascii=False)))
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояние FSM в {self.path}: {e}")
+            # Повторим при следующей записи
+            self._dirty |= dirty
+            return
+        self._flushes += 1
+        self._rows_written += len(rows)
+
+    # === BaseStorage ===
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        record = await self._record(key)
+        record[0] = state.state if isinstance(state, State) else state
+        self._changed(key, record)
+
+    async def get_state(self, key: StorageKey):
+        return (await self._record(key))[0]
+
+    async def set_data(self, key: StorageKey, data) -> None:
+        record = await self._record(key)
+        record[1] = data.copy()
+        self._changed(key, record)
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return (await self._record(key))[1].copy()
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        with self._db_lock:
+            self._db.close()
+        logger.info(f"Статистика хранилища FSM: {self.stats()}")
+
+    def stats(self) -> dict:
+        """Попадания в кэш, чтения с диска, записи обработчиков и строки, записанные на диск."""
+        return {
+            "cached": len(self._cache),
+            "hits": self._hits,
+            "misses": self._misses,
+            "writes": self._writes,
+            "rows_written": self._rows_written,
+            "flushes": self._flushes,
+        }
+
+
+def build_fsm_storage() -> BaseStorage:
+    """Хранилище FSM по FSM_STORAGE: sqlite (по умолчанию) или memory."""
+    if config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(
+        config.FSM_SQLITE_PATH,
+        cache_size=config.FSM_CACHE_SIZE,
+        flush_interval=config.FSM_FLUSH_INTERVAL,
+    )
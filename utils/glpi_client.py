@@ -0,0 +1,55 @@
+# utils/glpi_client.py
+import logging
+
+import config
+from glpi_api import DropdownCache, GLPIPool, RequestPolicy, SearchOptionsCache
+
+# Таймауты и повторы запросов к GLPI: статус заявки и создание заявки должны
+# укладываться в ограниченное время, загрузка документов — в отдельный таймаут.
+glpi_policy = RequestPolicy(
+    connect_timeout=config.GLPI_CONNECT_TIMEOUT,
+    read_timeout=config.GLPI_READ_TIMEOUT,
+    timeouts={"Document": (config.GLPI_CONNECT_TIMEOUT, config.GLPI_UPLOAD_TIMEOUT)},
+    max_retries=config.GLPI_MAX_RETRIES,
+)
+
+# Соответствие uid/id полей поиска (listSearchOptions) общее для всех сессий,
+# при заданном GLPI_SEARCH_OPTIONS_CACHE сохраняется на диск между перезапусками.
+search_options = SearchOptionsCache(
+    ttl=config.GLPI_SEARCH_OPTIONS_TTL,
+    path=config.GLPI_SEARCH_OPTIONS_CACHE,
+)
+
+# Названия справочников (категории, организации, пользователи, источники запросов)
+# для вывода полей заявки без отдельного запроса к GLPI на каждый id.
+dropdowns = DropdownCache(ttl=config.GLPI_DROPDOWN_TTL)
+
+# Справочники, загружаемые целиком при старте; пользователи подгружаются по мере надобности.
+WARM_DROPDOWNS = ("ITILCategory", "Entity", "RequestType")
+
+# Общий для процесса пул авторизованных сессий GLPI.
+# Сессии открываются при старте бота (main.on_startup) и закрываются при остановке,
+# обработчики только берут их во временное пользование:
+#
+#     async with glpi_pool.lease() as glpi:
+#         await glpi.get_item("Ticket", ticket_id)
+glpi_pool = GLPIPool(
+    config.GLPI_URL,
+    config.GLPI_APP_TOKEN,
+    config.GLPI_USER_TOKEN,
+    size=config.GLPI_POOL_SIZE,
+    verify_certs=config.GLPI_VERIFY_CERTS,
+    policy=glpi_policy,
+    search_options=search_options,
+    dropdowns=dropdowns,
+)
+
+
+async def warm_dropdowns():
+    """Загружает справочники WARM_DROPDOWNS в кэш названий."""
+    try:
+        async with glpi_pool.lease() as glpi:
+            count = await glpi.warm_dropdowns(*WARM_DROPDOWNS)
+        logging.info(f"Загружено названий справочников GLPI: {count}")
+    except Exception as e:
+        logging.error(f"Не удалось загрузить справочники GLPI: {e}")
@@ -1,6 +1,4 @@
 import os
-from bs4 import BeautifulSoup
-import pandas as pd
 
 def load_train_list():
     train_list_path = os.path.join(os.path.dirname(__file__), '../files', 'Test-tavria-poezda (1).txt')
@@ -17,13 +15,18 @@ def load_train_list():
 def clean_html(text):
     if not isinstance(text, str):
         return ""
+    # BeautifulSoup нужен только здесь, не загружаем его при старте бота
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(text, "html.parser")
     return soup.get_text(separator="\n").strip()
 
 
 
+import difflib
 import logging
-import pandas as pd
+import re
+
+from utils.wagon_registry import normalize_serial, wagon_registry
 
 # Настройка логирования
 logging.basicConfig(
@@ -34,39 +37,131 @@ logging.basicConfig(
 
 async def is_wagon_sn_valid(wagon_sn: str) -> bool:
     """
-    Проверяет, существует ли указанный серийный номер вагона в файле wagons.xlsx.
-    Использует правильный относительно текущего файла путь к Excel-файлу.
+    Проверяет, существует ли указанный серийный номер вагона в файле wagons.xlsx
+    и не выведен ли вагон из эксплуатации (колонка «Активен»).
+    Поиск идёт по индексу реестра вагонов (utils/wagon_registry.py), который
+    перечитывает файл только при его изменении.
     """
     try:
-        # Получаем абсолютный путь к текущему файлу helpers.py
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # Строим путь к файлу wagons.xlsx
-        file_path = os.path.join(current_dir, "..", "files", "wagons.xlsx")
-
-        # Проверяем существование файла
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Файл {file_path} не найден.")
-
-        # Загружаем данные
-        df = pd.read_excel(file_path)
-
-        # Проверяем наличие нужной колонки
-        if "Номер вагона" in df.columns:
-            wagon_numbers = df["Номер вагона"].astype(str).str.strip().unique()
-            exists = wagon_sn.strip() in wagon_numbers
-
-            # Логируем результат
-            if exists:
-                logging.info(f"Номер вагона {wagon_sn} найден в базе.")
-            else:
-                logging.warning(f"Номер вагона {wagon_sn} НЕ НАЙДЕН в базе.")
-
-            return exists
+        await wagon_registry.refresh()
+        exists = wagon_sn in wagon_registry
+        active = exists and wagon_registry.is_active(wagon_sn)
+
+        # Логируем результат
+        if active:
+            logging.info(f"Номер вагона {wagon_sn} найден в базе.")
+        elif exists:
+            logging.warning(f"Вагон {wagon_sn} найден в базе, но НЕ АКТИВЕН.")
         else:
-            error_msg = "В файле отсутствует колонка 'Номер вагона'"
-            logging.error(error_msg)
-            raise ValueError(error_msg)
+            logging.warning(f"Номер вагона {wagon_sn} НЕ НАЙДЕН в базе.")
+
+        return active
 
     except Exception as e:
         logging.error(f"Ошибка при проверке серийного номера вагона {wagon_sn}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+# Серийный номер вагона: 8 символов, показывается как «112 13456»
+WAGON_SN_LENGTH = 8
+WAGON_SN_SEPARATORS = re.compile(r"[,;\n]+")
+
+
+def normalize_wagon_sn(raw: str):
+    """
+    Приводит введённый номер вагона к виду «112 13456»: «11213456», «112 13456»
+    и «112-13456» дают один и тот же номер. Возвращает None, если длина неверна.
+    """
+    key = normalize_serial(raw).replace("-", "")
+    if len(key) != WAGON_SN_LENGTH:
+        return None
+    return f"{key[:3]} {key[3:]}"
+
+
+def split_wagon_sns(text: str) -> list:
+    """
+    Разбивает сообщение со списком номеров (через запятую, точку с запятой или
+    с новой строки) на отдельные номера. Номера, записанные через пробел в одной
+    строке («112 13456 112 13457»), собираются по 8 символов.
+    """
+    items = []
+    for chunk in WAGON_SN_SEPARATORS.split(text):
+        part = ""
+        for token in chunk.split():
+            part = f"{part} {token}".strip()
+            if len(normalize_serial(part).replace("-", "")) >= WAGON_SN_LENGTH:
+                items.append(part)
+                part = ""
+        if part:
+            items.append(part)
+    return items
+
+
+async def validate_serials(serials, suggestions: int = 3) -> list:
+    """
+    Проверяет сразу несколько номеров вагонов по реестру: номера нормализуются,
+    а наличие в реестре определяется одним пересечением множеств.
+
+    Для каждого номера возвращает словарь:
+        input       — номер как его ввели;
+        wagon_sn    — нормализованный номер («112 13456») или None при неверной длине;
+        found       — есть ли вагон в реестре;
+        active      — найден и не выведен из эксплуатации;
+        duplicate   — номер уже встречался выше в списке;
+        suggestions — похожие номера из реестра для ненайденных номеров.
+    """
+    await wagon_registry.refresh()
+    normalized = [normalize_wagon_sn(raw) for raw in serials]
+    keys = {wagon_sn.replace(" ", "") for wagon_sn in normalized if wagon_sn}
+    registry_keys = wagon_registry.keys()
+    found = keys & registry_keys
+    inactive = found & wagon_registry.inactive()
+
+    results = []
+    seen = set()
+    for raw, wagon_sn in zip(serials, normalized):
+        key = wagon_sn.replace(" ", "") if wagon_sn else normalize_serial(raw)
+        result = {
+            "input": raw,
+            "wagon_sn": wagon_sn,
+            "found": key in found,
+            "active": key in found and key not in inactive,
+            "duplicate": wagon_sn is not None and key in seen,
+            "suggestions": [],
+        }
+        if not result["found"] and suggestions and registry_keys:
+            result["suggestions"] = [
+                f"{match[:3]} {match[3:]}"
+                for match in difflib.get_close_matches(key, registry_keys, n=suggestions, cutoff=0.75)
+            ]
+        seen.add(key)
+        results.append(result)
+
+    missing = [result["input"] for result in results if not result["found"]]
+    if missing:
+        logging.warning(f"Номера вагонов НЕ НАЙДЕНЫ в базе: {', '.join(missing)}")
+    logging.info(f"Проверено номеров вагонов: {len(results)}, найдено: {len(results) - len(missing)}")
+    return results
+
+
+def format_wagon_attributes(wagon_sn: str) -> str:
+    """Строки с атрибутами вагона из реестра (модель, тип, предприятие) для текста заявки."""
+    return "".join(f"{label}: {value}\n" for label, value in wagon_registry.attributes(wagon_sn).items())
+
+
+def format_serial_errors(results) -> str:
+    """Текст с ошибками пакетной проверки номеров для ответа пользователю."""
+    lines = []
+    for result in results:
+        if result["wagon_sn"] is None:
+            lines.append(f"• {result['input']} — неверная длина, нужно 8 символов (например: 112 13456)")
+        elif result["duplicate"]:
+            lines.append(f"• {result['wagon_sn']} — указан повторно")
+        elif not result["found"]:
+            line = f"• {result['wagon_sn']} — не найден в базе"
+            if result["suggestions"]:
+                line += f" (возможно: {', '.join(result['suggestions'])})"
+            lines.append(line)
+        elif not result["active"]:
+            lines.append(f"• {result['wagon_sn']} — вагон не активен (выведен из эксплуатации)")
+    return "\n".join(lines)
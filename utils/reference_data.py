@@ -0,0 +1,205 @@
+# utils/reference_data.py
+"""
+Справочные данные (поезда и вагоны) с фоновым обновлением.
+
+Источник задаётся REFERENCE_SOURCE:
+    file — files/Test-tavria-poezda (1).txt и files/wagons.xlsx (по умолчанию);
+    glpi — поиск по инвентарю GLPI постранично (iter_search), при ошибке первой
+           загрузки используются файлы.
+
+Данные перечитываются каждые REFERENCE_REFRESH_INTERVAL сек в фоновой задаче.
+Новая версия сравнивается с текущей и, если что-то изменилось, подменяется
+целиком (каталог поездов — set_train_catalog, вагоны — wagon_registry.swap),
+так что обработчики всегда ищут в памяти.
+"""
+import asyncio
+import logging
+
+import config
+from utils.glpi_client import glpi_pool
+from utils.helpers import load_train_list
+from utils.train_catalog import TrainCatalog, get_train_catalog, set_train_catalog
+from utils.wagon_registry import ACTIVE_COLUMN, SERIAL_COLUMN, WagonTable, compile_rows, wagon_registry
+
+logger = logging.getLogger(__name__)
+
+# Колонки реестра вагонов и поля поиска GLPI (uid без имени типа), из которых они берутся
+WAGON_FIELDS = {
+    SERIAL_COLUMN: "serial",
+    "Модель вагона": "ComputerModel.name",
+    "Тип вагона": "ComputerType.name",
+    "Предприятие приписки": "Entity.completename",
+    ACTIVE_COLUMN: "State.completename",
+}
+
+
+def wagon_activity(state, inactive_states) -> str:
+    """
+    «Да»/«Нет» для колонки «Активен» по статусу GLPI. Статус неактивен, если он
+    или один из его родителей (completename «Родитель > Статус») входит в
+    `inactive_states`; вагон без статуса считается активным.
+    """
+    if not state:
+        return "Да"
+    parts = {part.strip().lower() for part in str(state).split(">")}
+    return "Нет" if parts & inactive_states else "Да"
+
+
+class FileSource:
+    """Поезда из текстового файла, вагоны — из wagons.xlsx (реестр следит за файлом сам)."""
+
+    name = "file"
+
+    async def load_trains(self):
+        return await asyncio.to_thread(load_train_list)
+
+    async def load_wagons(self):
+        # После вагонов из GLPI реестр снова читает XLSX и следит за ним
+        force = not wagon_registry.auto_reload
+        wagon_registry.auto_reload = True
+        await wagon_registry.refresh(force=force)
+        return None
+
+
+class GLPISource:
+    """Поезда и вагоны из инвентаря GLPI."""
+
+    name = "glpi"
+
+    def __init__(self, pool, train_itemtype, train_field, wagon_itemtype, wagon_fields=WAGON_FIELDS,
+                 inactive_states=(), page_size=500):
+        self.pool = pool
+        self.train_itemtype = train_itemtype
+        self.train_field = train_field
+        self.wagon_itemtype = wagon_itemtype
+        self.wagon_fields = wagon_fields
+        # Статусы GLPI выведенных из эксплуатации вагонов (в колонке «Активен» — «Нет»)
+        self.inactive_states = {state.lower() for state in inactive_states}
+        self.page_size = page_size
+
+    async def _search(self, glpi, itemtype, uids):
+        """Строки поиска по `itemtype` с полями `uids`, в виде кортежей значений."""
+        ids = [await glpi.field_id(itemtype, uid) for uid in uids]
+        rows = []
+        async for row in glpi.iter_search(itemtype, forcedisplay=ids, page_size=self.page_size):
+            rows.append(tuple(row.get(field_id) for field_id in ids))
+        return rows
+
+    async def load_trains(self):
+        async with self.pool.lease() as glpi:
+            rows = await self._search(glpi, self.train_itemtype, [self.train_field])
+        return [str(name) for (name,) in rows if name]
+
+    async def load_wagons(self):
+        async with self.pool.lease() as glpi:
+            rows = await self._search(glpi, self.wagon_itemtype, list(self.wagon_fields.values()))
+        columns = list(self.wagon_fields)
+        if ACTIVE_COLUMN in columns:
+            # Реестр понимает «Да»/«Нет», а GLPI отдаёт название статуса
+            position = columns.index(ACTIVE_COLUMN)
+            rows = [row[:position] + (wagon_activity(row[position], self.inactive_states),) + row[position + 1:]
+                    for row in rows]
+        return columns, rows
+
+
+class ReferenceData:
+    """
+    Загружает справочные данные из `source` и обновляет их каждые `interval` сек.
+    Если источник недоступен при первой загрузке, используется `fallback`;
+    при последующих ошибках остаются последние загруженные данные.
+    """
+
+    def __init__(self, source, fallback=None, interval=900):
+        self.source = source
+        self.fallback = fallback
+        self.interval = interval
+        self._task = None
+        self._wagon_keys = None
+        self._loaded = False
+
+    async def start(self):
+        """Первая загрузка и запуск фонового обновления."""
+        await self.refresh()
+        if self._task is None and self.interval:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    async def refresh(self):
+        try:
+            await self._load(self.source)
+            self._loaded = True
+        except Exception as e:
+            logger.error(f"Не удалось загрузить справочные данные из источника {self.source.name}: {e}")
+            if not self._loaded and self.fallback is not None:
+                await self._load(self.fallback)
+                self._loaded = True
+
+    async def _load(self, source):
+        trains, wagons = await asyncio.gather(source.load_trains(), source.load_wagons())
+        self._swap_trains(trains, source.name)
+        if wagons is not None:
+            update = await asyncio.to_thread(self._build_wagons, *wagons)
+            if update is not None:
+                self._swap_wagons(*update, source.name)
+
+    @staticmethod
+    def _swap_trains(trains, source_name):
+        current = get_train_catalog()
+        catalog = TrainCatalog(trains)
+        if catalog.version == current.version:
+            return
+        added = set(catalog.trains) - set(current.trains)
+        removed = set(current.trains) - set(catalog.trains)
+        set_train_catalog(catalog)
+        logger.info(f"Каталог поездов обновлён ({source_name}): "
+                    f"{len(catalog)} поездов, +{len(added)} / -{len(removed)}")
+
+    def _build_wagons(self, columns, rows):
+        """Собирает таблицу вагонов (выполняется в потоке); None, если вагоны не изменились."""
+        keys = {row[columns.index(SERIAL_COLUMN)]: row for row in rows
+                if row[columns.index(SERIAL_COLUMN)]}
+        if keys == self._wagon_keys:
+            return None
+        return keys, WagonTable(compile_rows(columns, list(keys.values()))).build_indexes()
+
+    def _swap_wagons(self, keys, table, source_name):
+        """Подменяет реестр вагонов собранной таблицей (в цикле событий, см. WagonRegistry.swap)."""
+        added = keys.keys() - (self._wagon_keys or {}).keys()
+        removed = (self._wagon_keys or {}).keys() - keys.keys()
+        changed = sum(1 for key in keys.keys() & (self._wagon_keys or {}).keys()
+                      if keys[key] != self._wagon_keys[key])
+        wagon_registry.auto_reload = False
+        wagon_registry.swap(table)
+        self._wagon_keys = keys
+        logger.info(f"Реестр вагонов обновлён ({source_name}): {len(table)} вагонов, "
+                    f"+{len(added)} / -{len(removed)} / изменено {changed}")
+
+
+def build_reference_data() -> ReferenceData:
+    file_source = FileSource()
+    if config.REFERENCE_SOURCE == "glpi":
+        source = GLPISource(
+            glpi_pool,
+            train_itemtype=config.REFERENCE_TRAIN_ITEMTYPE,
+            train_field=config.REFERENCE_TRAIN_FIELD,
+            wagon_itemtype=config.REFERENCE_WAGON_ITEMTYPE,
+            inactive_states=config.REFERENCE_WAGON_INACTIVE_STATES,
+        )
+        return ReferenceData(source, fallback=file_source, interval=config.REFERENCE_REFRESH_INTERVAL)
+    return ReferenceData(file_source, interval=config.REFERENCE_REFRESH_INTERVAL)
+
+
+reference_data = build_reference_data()
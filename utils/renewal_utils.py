@@ -2,8 +2,7 @@
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardMarkup, InlineKeyboardButton
-import os
-import tempfile
+import aiofiles
 from aiogram import Bot
 
 
@@ -58,23 +57,26 @@ async def show_renewal_summary(message: CallbackQuery | Message, state: FSMConte
 
 
 
-async def download_file(bot: Bot, file_id: str) -> str:
+async def stream_file(bot: Bot, file_id: str, chunk_size: int = 65536):
         """
-        Скачивает файл из Telegram и возвращает путь к нему.
+        Отдаёт содержимое файла из Telegram частями по мере скачивания,
+        без сохранения во временный файл.
         """
         try:
             file = await bot.get_file(file_id)
-            file_path = os.path.join(tempfile.gettempdir(), file.file_path)
-
-            # Создаём директорию, если её нет
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-            # Скачиваем файл
-            await bot.download_file(file.file_path, destination=file_path)
-            return file_path
         except Exception as e:
             raise RuntimeError(f"Ошибка при загрузке файла: {e}")
 
+        if bot.session.api.is_local:
+            async with aiofiles.open(bot.session.api.wrap_local_file.to_local(file.file_path), "rb") as f:
+                while chunk := await f.read(chunk_size):
+                    yield chunk
+            return
+
+        url = bot.session.api.file_url(bot.token, file.file_path)
+        async for chunk in bot.session.stream_content(url=url, chunk_size=chunk_size, raise_for_status=True):
+            yield chunk
+
 async def show_renewal_summary_v2(message: Message, state: FSMContext):
         """
         Показывает сводку по заявке v2 с возможностью подтверждения или редактирования.
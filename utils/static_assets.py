@@ -0,0 +1,122 @@
+# utils/static_assets.py
+"""
+Файлы из поставки бота (например, files/Form.doc), которые отправляются пользователям.
+
+Файл загружается в Telegram один раз, полученный file_id сохраняется в JSON
+(STATIC_ASSETS_CACHE) по ключу «id бота:sha256 содержимого:имя файла».
+Следующие отправки передают только file_id. Если файл изменился, у него другой
+хэш, и он загружается заново; если Telegram не принимает сохранённый file_id,
+запись удаляется и файл тоже загружается заново.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path) -> str:
+    """sha256 содержимого файла."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StaticAssets:
+    """Кэш file_id файлов, отправляемых ботом, с сохранением на диск."""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._file_ids = None
+        # путь -> ((mtime_ns, размер), sha256): хэш пересчитывается только при изменении файла
+        self._digests = {}
+        self._lock = asyncio.Lock()
+        # Статистика
+        self._uploads = 0
+        self._reused = 0
+
+    def _load(self) -> dict:
+        if self._file_ids is None:
+            try:
+                with open(self.cache_path, encoding="utf-8") as f:
+                    self._file_ids = json.load(f)
+            except FileNotFoundError:
+                self._file_ids = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось прочитать кэш file_id {self.cache_path}: {e}")
+                self._file_ids = {}
+        return self._file_ids
+
+    def _save(self, file_ids):
+        try:
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(file_ids, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш file_id {self.cache_path}: {e}")
+
+    async def _digest(self, path) -> str:
+        stat = os.stat(path)
+        signature = stat.st_mtime_ns, stat.st_size
+        cached = self._digests.get(path)
+        if cached is None or cached[0] != signature:
+            cached = signature, await asyncio.to_thread(file_digest, path)
+            self._digests[path] = cached
+        return cached[1]
+
+    async def _remember(self, key, file_id):
+        file_ids = dict(self._load())
+        if file_id is None:
+            file_ids.pop(key, None)
+        else:
+            file_ids[key] = file_id
+        self._file_ids = file_ids
+        await asyncio.to_thread(self._save, file_ids)
+
+    async def send_document(self, message: Message, path, filename=None, **kwargs) -> Message:
+        """
+        Отправляет файл `path` в чат сообщения: по сохранённому file_id, а если его
+        нет — загрузкой файла с сохранением полученного file_id.
+        """
+        filename = filename or os.path.basename(path)
+        key = f"{message.bot.id}:{await self._digest(path)}:{filename}"
+
+        file_id = self._load().get(key)
+        if file_id is not None:
+            try:
+                sent = await message.answer_document(document=file_id, **kwargs)
+                self._reused += 1
+                return sent
+            except TelegramBadRequest as e:
+                logger.warning(f"Сохранённый file_id для {path} не принят Telegram: {e}")
+                await self._remember(key, None)
+
+        # Одновременные первые отправки загружают файл один раз
+        async with self._lock:
+            file_id = self._load().get(key)
+            if file_id is not None:
+                self._reused += 1
+                return await message.answer_document(document=file_id, **kwargs)
+            sent = await message.answer_document(document=FSInputFile(path, filename=filename), **kwargs)
+            self._uploads += 1
+            if sent.document is not None:
+                await self._remember(key, sent.document.file_id)
+                logger.info(f"Файл {path} загружен в Telegram, file_id сохранён")
+            return sent
+
+    def stats(self) -> dict:
+        """Загрузки файлов и отправки по сохранённому file_id."""
+        return {"uploads": self._uploads, "reused": self._reused}
+
+
+static_assets = StaticAssets(config.STATIC_ASSETS_CACHE)
@@ -0,0 +1,163 @@
+# utils/ticket_cache.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import config
+from utils.glpi_client import glpi_pool
+
+logger = logging.getLogger(__name__)
+
+# Типы связи Ticket_User для назначенных исполнителей и поля поиска по заявкам
+ASSIGNED_USER_TYPE = 2
+ID_FIELD = 2
+DATE_MOD_FIELD = 19
+
+
+class TicketCache:
+    """
+    Кэш данных заявок для проверки статуса, по номеру заявки.
+
+    Запись, проверенная менее `fresh` сек назад, отдаётся из памяти без обращения
+    к GLPI. Более старая (загруженная менее `ttl` сек назад) перепроверяется лёгким
+    поиском по id с одним полем `date_mod`: если дата изменения не поменялась,
+    запись продлевается, иначе заявка загружается заново. GLPI не отдаёт ETag для элементов, поэтому проверка идёт
+    только по `date_mod`. Ненайденные заявки запоминаются на `negative_ttl` сек.
+    Одновременные запросы одной заявки выполняются одним обращением к GLPI.
+    """
+
+    def __init__(self, pool, fresh=15, ttl=600, negative_ttl=30, max_size=1024):
+        self.pool = pool
+        self.fresh = fresh
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # ticket_id -> (данные заявки или None, время проверки, время загрузки)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # Статистика
+        self._hits = 0
+        self._revalidated = 0
+        self._loads = 0
+
+    async def get(self, ticket_id: int):
+        """
+        Возвращает данные заявки (см. `_load`) или None, если заявка не найдена.
+        """
+        entry = self._entries.get(ticket_id)
+        if entry is not None:
+            info, checked, _ = entry
+            age = time.monotonic() - checked
+            if age < (self.fresh if info is not None else self.negative_ttl):
+                self._entries.move_to_end(ticket_id)
+                self._hits += 1
+                return info
+
+        # Заявку уже запрашивает другой пользователь — ждём тот же ответ
+        if ticket_id in self._inflight:
+            return await asyncio.shield(self._inflight[ticket_id])
+
+        task = asyncio.ensure_future(self._refresh(ticket_id, entry))
+        self._inflight[ticket_id] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(ticket_id, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(ticket_id, None))
+
+    def invalidate(self, ticket_id: int = None):
+        """Удаляет заявку из кэша (все заявки, если номер не указан)."""
+        if ticket_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(ticket_id, None)
+
+    async def _refresh(self, ticket_id, entry):
+        async with self.pool.lease() as glpi:
+            info = entry[0] if entry is not None else None
+            # Запись с номерами вместо названий справочников не продлевается:
+            # названия запрашиваются заново при полной загрузке
+            if (info is not None and info.get("names_resolved", True)
+                    and time.monotonic() - entry[2] < self.ttl):
+                rows = await glpi.search(
+                    "Ticket",
+                    criteria=[{"field": ID_FIELD, "searchtype": "equals", "value": ticket_id}],
+                    forcedisplay=[DATE_MOD_FIELD],
+                )
+                if rows and rows[0].get(str(DATE_MOD_FIELD)) == info["ticket"].get("date_mod"):
+                    self._revalidated += 1
+                    self._store(ticket_id, info, entry[2])
+                    return info
+            self._loads += 1
+            info = await self._load(glpi, ticket_id)
+        self._store(ticket_id, info)
+        return info
+
+    @staticmethod
+    async def _load(glpi, ticket_id):
+        """
+        Загружает заявку с участниками и названиями справочников:
+        {"ticket": ..., "category": ..., "entity": ..., "assigned": [...],
+        "names_resolved": ...}.
+        """
+        # Запросы идут по очереди: при одновременных запросах через одну сессию
+        # с просроченным токеном каждый из них заново открывал бы сессию GLPI
+        ticket = await glpi.get_item("Ticket", ticket_id)
+        if ticket is None:
+            return None
+        # Ошибка получения участников или названий не мешает показать заявку
+        try:
+            ticket_users = await glpi.get_sub_items("Ticket", ticket_id, "Ticket_User")
+        except Exception as e:
+            logger.warning(f"Не удалось получить участников заявки {ticket_id}: {e}")
+            ticket_users = []
+
+        # Названия категории, организации и исполнителей — из кэша справочников,
+        # отсутствующие в кэше запрашиваются одним запросом
+        category_ref = ("ITILCategory", ticket.get("itilcategories_id"))
+        entity_ref = ("Entity", ticket.get("entities_id"))
+        user_refs = [("User", link["users_id"]) for link in ticket_users or []
+                     if isinstance(link, dict) and link.get("type") == ASSIGNED_USER_TYPE]
+        refs = [category_ref, entity_ref, *user_refs]
+        try:
+            names = await glpi.resolve_dropdowns(*refs)
+            names_resolved = True
+        except Exception as e:
+            logger.warning(f"Не удалось получить названия справочников заявки {ticket_id}: {e}")
+            # Вместо названий показываются номера
+            names = {(itemtype, int(item_id)): f"#{item_id}" for itemtype, item_id in refs if item_id}
+            names_resolved = False
+        return {
+            "ticket": ticket,
+            "category": names.get(category_ref),
+            "entity": names.get(entity_ref),
+            "assigned": list(filter(None, (names.get(ref) for ref in user_refs))),
+            "names_resolved": names_resolved,
+        }
+
+    def _store(self, ticket_id, info, loaded=None):
+        now = time.monotonic()
+        self._entries[ticket_id] = (info, now, now if loaded is None else loaded)
+        self._entries.move_to_end(ticket_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Ответы из памяти, подтверждённые по date_mod и полные загрузки."""
+        return {
+            "size": len(self._entries),
+            "hits": self._hits,
+            "revalidated": self._revalidated,
+            "loads": self._loads,
+        }
+
+
+ticket_cache = TicketCache(
+    glpi_pool,
+    fresh=config.TICKET_CACHE_FRESH,
+    ttl=config.TICKET_CACHE_TTL,
+    negative_ttl=config.TICKET_CACHE_NEGATIVE_TTL,
+)
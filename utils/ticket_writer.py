@@ -0,0 +1,144 @@
+# utils/ticket_writer.py
+import asyncio
+import logging
+
+import config
+from glpi_api import GLPIError
+from utils.glpi_client import glpi_pool
+
+logger = logging.getLogger(__name__)
+
+
+class TicketWriter:
+    """
+    Очередь создания заявок: заявки, поступившие в течение короткого окна `window`
+    (сек) или до набора `max_batch` штук, отправляются в GLPI одним вызовом `add`.
+    Каждый отправитель получает id своей заявки или исключение GLPIError
+    с сообщением GLPI по своему элементу.
+    """
+
+    def __init__(self, pool, itemtype="Ticket", window=0.2, max_batch=20):
+        self.pool = pool
+        self.itemtype = itemtype
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = None
+        self._task = None
+        self._flushes = set()
+        # Статистика
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+        self._flush_time = 0.0
+        self._max_flush_time = 0.0
+        self._errors = 0
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Отправляет накопленные заявки и останавливает фоновую задачу."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            self._flushes.add(asyncio.create_task(self._flush(batch)))
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def submit(self, item: dict) -> int:
+        """Ставит заявку в очередь и возвращает её id после создания в GLPI."""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put_nowait((item, future, loop.time()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                # Пачки отправляются параллельно, их число ограничено размером пула сессий
+                task = asyncio.create_task(self._flush(batch))
+                self._flushes.add(task)
+                task.add_done_callback(self._flushes.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # Заявки, уже взятые из очереди в набираемую пачку, отправляются при
+            # остановке (stop дожидается всех отправок)
+            if batch:
+                self._flushes.add(asyncio.create_task(self._flush(batch)))
+            raise
+
+    async def _flush(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _, _ in batch]
+        try:
+            async with self.pool.lease() as glpi:
+                results = await glpi.add(self.itemtype, *items)
+            if len(results) != len(batch):
+                raise GLPIError(f"GLPI вернул {len(results)} результатов на {len(batch)} заявок")
+        except Exception as e:
+            self._errors += len(batch)
+            logger.error(f"Ошибка при создании пачки из {len(batch)} заявок: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e if isinstance(e, GLPIError) else GLPIError(str(e)))
+            return
+
+        now = loop.time()
+        for (_, future, enqueued), result in zip(batch, results):
+            self._flush_time += now - enqueued
+            self._max_flush_time = max(self._max_flush_time, now - enqueued)
+            if future.done():
+                continue
+            if result.get("id"):
+                future.set_result(int(result["id"]))
+            else:
+                self._errors += 1
+                future.set_exception(GLPIError(result.get("message") or "заявка не создана"))
+        self._batches += 1
+        self._items += len(batch)
+        self._max_batch_seen = max(self._max_batch_seen, len(batch))
+        logger.info(f"Создана пачка заявок в GLPI: {len(batch)} шт.")
+
+    def stats(self) -> dict:
+        """Размеры пачек и задержка от постановки в очередь до ответа GLPI (сек)."""
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch": self._items / self._batches if self._batches else 0.0,
+            "max_batch": self._max_batch_seen,
+            "avg_latency": self._flush_time / self._items if self._items else 0.0,
+            "max_latency": self._max_flush_time,
+            "errors": self._errors,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+
+ticket_writer = TicketWriter(
+    glpi_pool,
+    window=config.TICKET_BATCH_WINDOW,
+    max_batch=config.TICKET_BATCH_MAX,
+)
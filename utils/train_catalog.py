@@ -0,0 +1,121 @@
+# utils/train_catalog.py
+import hashlib
+from collections import OrderedDict
+
+from utils.helpers import load_train_list
+
+# Латинские буквы, похожие на кириллические: «018M» ищется как «018М»
+HOMOGLYPHS = str.maketrans("ABCEHKMOPTXY", "АВСЕНКМОРТХУ")
+# Опечатки ищутся только в запросах не короче этого: одна правка короткого
+# запроса подходит почти к любому поезду
+FUZZY_MIN_LENGTH = 3
+
+
+def fold(text: str) -> str:
+    """Нормализует номер поезда или запрос: верхний регистр, кириллица, без пробелов и дефисов."""
+    return "".join(text.upper().translate(HOMOGLYPHS).replace("-", "").split())
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """Отличаются ли строки не более чем на одну замену, вставку или удаление."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class TrainCatalog:
+    """
+    Индекс номеров поездов для поиска: строится один раз из списка поездов.
+
+    Каталог неизменяем и общий для всех пользователей: в FSM хранится только его
+    версия (`version`) и номер страницы, а не сам список поездов.
+
+    Поиск сначала берёт совпадения по префиксу из префиксного дерева, затем
+    добавляет поезда, содержащие запрос, и только потом — поезда, отличающиеся
+    от запроса (или от его начала) на одну опечатку, если запрос не короче
+    FUZZY_MIN_LENGTH. Сравнение идёт по нормализованным номерам (см. `fold`).
+    """
+
+    def __init__(self, trains):
+        # Уникальные номера в исходном порядке
+        self.trains = list(dict.fromkeys(t.strip() for t in trains if t.strip()))
+        self._keys = [fold(t) for t in self.trains]
+        self._key_set = set(self._keys)
+        self.version = hashlib.sha1("\n".join(self.trains).encode("utf-8")).hexdigest()[:12]
+        # Узел дерева: {символ: узел, "": [индексы поездов с этим префиксом]}
+        self._trie = {"": list(range(len(self.trains)))}
+        for idx, key in enumerate(self._keys):
+            node = self._trie
+            for char in key:
+                node = node.setdefault(char, {"": []})
+                node[""].append(idx)
+
+    def _prefix(self, key):
+        node = self._trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node[""]
+
+    def page(self, page: int, per_page: int):
+        """Возвращает поезда страницы `page` и признак наличия следующей страницы."""
+        start = page * per_page
+        return self.trains[start:start + per_page], start + per_page < len(self.trains)
+
+    def pages(self, per_page: int) -> int:
+        return (len(self.trains) + per_page - 1) // per_page
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Возвращает до `limit` номеров поездов, подходящих под запрос, лучшие первыми."""
+        key = fold(query)
+        if not key:
+            return self.trains[:limit]
+
+        found = dict.fromkeys(self._prefix(key))
+        if len(found) < limit:
+            for idx, train_key in enumerate(self._keys):
+                if key in train_key:
+                    found.setdefault(idx)
+        if len(found) < limit and len(key) >= FUZZY_MIN_LENGTH:
+            for idx, train_key in enumerate(self._keys):
+                if within_one_edit(key, train_key) or within_one_edit(key, train_key[:len(key)]):
+                    found.setdefault(idx)
+        return [self.trains[idx] for idx in list(found)[:limit]]
+
+    def __contains__(self, train):
+        return fold(train) in self._key_set
+
+    def __len__(self):
+        return len(self.trains)
+
+
+# Несколько последних версий каталога: пользователь, начавший листать список
+# до обновления каталога, досматривает ту же версию
+MAX_VERSIONS = 4
+_catalogs = OrderedDict()
+
+
+def get_train_catalog(version: str = None) -> TrainCatalog:
+    """Каталог версии `version` (из FSM), текущий — если версия не указана или устарела."""
+    if version is not None and version in _catalogs:
+        return _catalogs[version]
+    return next(reversed(_catalogs.values()))
+
+
+def set_train_catalog(catalog: TrainCatalog):
+    """Делает каталог текущим."""
+    _catalogs.pop(catalog.version, None)
+    _catalogs[catalog.version] = catalog
+    while len(_catalogs) > MAX_VERSIONS:
+        _catalogs.popitem(last=False)
+
+
+set_train_catalog(TrainCatalog(load_train_list()))
@@ -0,0 +1,418 @@
+# utils/wagon_registry.py
+"""
+Реестр вагонов из files/wagons.xlsx.
+
+Чтобы при запуске не импортировать pandas/openpyxl и не распаковывать XLSX,
+таблица компилируется в бинарный файл-спутник (files/wagons.idx), который
+открывается через mmap за миллисекунды:
+
+    python -m utils.wagon_registry build [wagons.xlsx] [wagons.idx]
+
+Формат файла-спутника (little-endian):
+    заголовок   MAGIC, mtime_ns и размер исходного XLSX, число строк, число колонок
+    колонки     длина + JSON со списком названий колонок
+    ключи       для каждой строки (смещение, длина) нормализованного номера,
+                строки отсортированы по ключу
+    ячейки      для каждой строки и колонки (смещение, длина) значения в JSON
+    данные      байты ключей и значений
+
+Если файл-спутник отсутствует или построен по другой версии XLSX, таблица
+читается из XLSX, а файл-спутник пересобирается (если каталог доступен на запись).
+
+При загрузке таблицы (в отдельном потоке) строятся индексы в памяти: номер →
+строка и значения колонок INDEX_COLUMNS (активность, предприятие приписки) →
+номера вагонов, так что проверки в обработчиках не перебирают таблицу.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "files")
+WAGONS_PATH = os.path.join(FILES_DIR, "wagons.xlsx")
+SIDECAR_PATH = os.path.join(FILES_DIR, "wagons.idx")
+SERIAL_COLUMN = "Номер вагона"
+ACTIVE_COLUMN = "Активен"
+ENTERPRISE_COLUMN = "Предприятие приписки"
+
+# Колонки со вторичными индексами
+INDEX_COLUMNS = (ACTIVE_COLUMN, ENTERPRISE_COLUMN)
+# Значения колонки «Активен» у выведенных из эксплуатации вагонов
+INACTIVE_VALUES = frozenset({"нет", "false", "0"})
+# Колонки, которые подставляются в текст заявки: колонка -> подпись
+TICKET_ATTRIBUTES = {
+    "Модель вагона": "Модель вагона",
+    "Тип вагона": "Тип вагона",
+    ENTERPRISE_COLUMN: "Предприятие приписки",
+}
+
+MAGIC = b"WAGONS01"
+HEADER = struct.Struct("<8sqqII")
+LENGTH = struct.Struct("<I")
+SLOT = struct.Struct("<II")
+
+
+def normalize_serial(serial) -> str:
+    """Приводит серийный номер к ключу индекса: без пробелов, в верхнем регистре."""
+    return "".join(str(serial).split()).upper()
+
+
+def file_signature(path):
+    """(mtime_ns, размер) файла или None, если файла нет."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def compile_rows(columns, rows, column=SERIAL_COLUMN, signature=None) -> bytes:
+    """
+    Возвращает содержимое файла-спутника для строк `rows` (кортежи значений
+    в порядке `columns`), ключ — колонка `column`.
+    """
+    columns = [str(name) for name in columns]
+    key_index = columns.index(column)
+    by_key = {}
+    for row in rows:
+        serial = row[key_index]
+        if serial is not None:
+            by_key[normalize_serial(serial).encode("utf-8")] = row
+    keys = sorted(by_key)
+
+    data = bytearray()
+    key_slots = []
+    cell_slots = []
+
+    def put(value: bytes):
+        slot = SLOT.pack(len(data), len(value))
+        data.extend(value)
+        return slot
+
+    for key in keys:
+        key_slots.append(put(key))
+        for value in by_key[key]:
+            cell_slots.append(put(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")))
+
+    columns_json = json.dumps(columns, ensure_ascii=False).encode("utf-8")
+    mtime_ns, size = signature or (0, 0)
+    return b"".join([
+        HEADER.pack(MAGIC, mtime_ns, size, len(keys), len(columns)),
+        LENGTH.pack(len(columns_json)),
+        columns_json,
+        *key_slots,
+        *cell_slots,
+        bytes(data),
+    ])
+
+
+def compile_table(xlsx_path=WAGONS_PATH, column=SERIAL_COLUMN) -> bytes:
+    """Читает XLSX и возвращает содержимое файла-спутника."""
+    # pandas/openpyxl нужны только для сборки файла-спутника
+    import pandas as pd
+
+    signature = file_signature(xlsx_path)
+    df = pd.read_excel(xlsx_path)
+    if column not in df.columns:
+        raise ValueError(f"В файле отсутствует колонка '{column}'")
+    df = df.astype(object).where(pd.notna(df), None)
+    return compile_rows(df.columns, df.itertuples(index=False, name=None), column, signature)
+
+
+def is_active_value(value) -> bool:
+    """Активен ли вагон по значению колонки «Активен» (пустое значение — активен)."""
+    return value is None or str(value).strip().lower() not in INACTIVE_VALUES
+
+
+class WagonTable:
+    """
+    Таблица вагонов поверх содержимого файла-спутника (mmap или bytes):
+    поиск номера — двоичный поиск по отсортированным ключам, строка собирается
+    из ячеек только для найденного вагона.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, self.mtime_ns, self.size, self._rows, self._cols = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("неверный формат файла-спутника реестра вагонов")
+        offset = HEADER.size
+        (length,) = LENGTH.unpack_from(buffer, offset)
+        offset += LENGTH.size
+        self.columns = json.loads(bytes(buffer[offset:offset + length]).decode("utf-8"))
+        offset += length
+        self._keys_offset = offset
+        self._cells_offset = offset + self._rows * SLOT.size
+        self._data_offset = self._cells_offset + self._rows * self._cols * SLOT.size
+        # Индексы в памяти (см. build_indexes)
+        self._positions = None
+        self._key_set = None
+        self._secondary = {}
+        self._inactive = frozenset()
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def signature(self):
+        return self.mtime_ns, self.size
+
+    def close(self):
+        """Освобождает mmap файла-спутника (у таблицы из bytes закрывать нечего)."""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def _slice(self, slot_offset):
+        offset, length = SLOT.unpack_from(self._buffer, slot_offset)
+        start = self._data_offset + offset
+        return self._buffer[start:start + length]
+
+    def key(self, index) -> bytes:
+        return self._slice(self._keys_offset + index * SLOT.size)
+
+    def cell(self, index, column):
+        base = self._cells_offset + index * self._cols * SLOT.size
+        return json.loads(self._slice(base + self.columns.index(column) * SLOT.size))
+
+    def row(self, index) -> dict:
+        base = self._cells_offset + index * self._cols * SLOT.size
+        return {
+            column: json.loads(self._slice(base + col * SLOT.size))
+            for col, column in enumerate(self.columns)
+        }
+
+    def build_indexes(self, columns=INDEX_COLUMNS):
+        """
+        Строит индексы в памяти: номер -> индекс строки и для каждой колонки
+        из `columns` значение -> номера вагонов. Выполняется один раз при загрузке.
+        """
+        positions = {}
+        secondary = {column: {} for column in columns if column in self.columns}
+        for index in range(self._rows):
+            key = bytes(self.key(index)).decode("utf-8")
+            positions[key] = index
+            for column, values in secondary.items():
+                values.setdefault(self.cell(index, column), set()).add(key)
+        self._secondary = {
+            column: {value: frozenset(keys) for value, keys in values.items()}
+            for column, values in secondary.items()
+        }
+        self._inactive = frozenset().union(*(
+            keys for value, keys in self._secondary.get(ACTIVE_COLUMN, {}).items()
+            if not is_active_value(value)
+        ))
+        self._key_set = frozenset(positions)
+        self._positions = positions
+        return self
+
+    def find(self, serial):
+        """Индекс строки вагона или None."""
+        if self._positions is not None:
+            return self._positions.get(normalize_serial(serial))
+        key = normalize_serial(serial).encode("utf-8")
+        index = bisect.bisect_left(_Keys(self), key)
+        if index < self._rows and self.key(index) == key:
+            return index
+        return None
+
+    def get(self, serial):
+        index = self.find(serial)
+        return None if index is None else self.row(index)
+
+    def keys(self) -> frozenset:
+        """Все нормализованные номера таблицы (для пакетной проверки и подсказок)."""
+        if self._key_set is None:
+            self.build_indexes()
+        return self._key_set
+
+    def select(self, column, value) -> frozenset:
+        """Номера вагонов со значением `value` в колонке `column` (колонка из INDEX_COLUMNS)."""
+        if self._positions is None:
+            self.build_indexes()
+        return self._secondary.get(column, {}).get(value, frozenset())
+
+    def inactive(self) -> frozenset:
+        """Номера вагонов, выведенных из эксплуатации (колонка «Активен»)."""
+        if self._positions is None:
+            self.build_indexes()
+        return self._inactive
+
+    def __len__(self):
+        return self._rows
+
+
+class _Keys:
+    """Последовательность ключей таблицы для bisect."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, index):
+        return self._table.key(index)
+
+
+def load_table(xlsx_path=WAGONS_PATH, sidecar_path=SIDECAR_PATH, column=SERIAL_COLUMN):
+    """
+    Открывает актуальный файл-спутник, иначе собирает таблицу из XLSX
+    и сохраняет файл-спутник (ошибка записи не мешает работе).
+    """
+    signature = file_signature(xlsx_path)
+    try:
+        table = WagonTable.open(sidecar_path)
+        if signature is None or table.signature() == signature:
+            return table
+        table.close()
+        logger.info("Файл-спутник реестра вагонов устарел, читаем XLSX")
+    except (OSError, ValueError, struct.error):
+        logger.info("Файл-спутник реестра вагонов не найден, читаем XLSX")
+
+    content = compile_table(xlsx_path, column)
+    try:
+        tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить файл-спутник реестра вагонов: {e}")
+    return WagonTable(content)
+
+
+def load_indexed_table(xlsx_path=WAGONS_PATH, sidecar_path=SIDECAR_PATH, column=SERIAL_COLUMN):
+    """load_table с построением индексов в памяти."""
+    return load_table(xlsx_path, sidecar_path, column).build_indexes()
+
+
+class WagonRegistry:
+    """
+    Реестр вагонов: проверка номера без обращения к XLSX.
+
+    При изменении XLSX (mtime/размер, проверяются не чаще раза в `check_interval`
+    сек) таблица перезагружается в отдельном потоке и подменяется целиком,
+    так что обработчики всегда видят либо старую, либо новую версию. Если вагоны
+    берутся из другого источника (`swap`), XLSX не перечитывается (`auto_reload`).
+    """
+
+    def __init__(self, path=WAGONS_PATH, sidecar_path=SIDECAR_PATH, column=SERIAL_COLUMN,
+                 check_interval=5.0):
+        self.path = path
+        self.sidecar_path = sidecar_path
+        self.column = column
+        self.check_interval = check_interval
+        self._table = None
+        self._signature = None
+        self._checked = 0.0
+        self._lock = asyncio.Lock()
+        # False, когда таблицу подменяет другой источник (см. utils/reference_data.py)
+        self.auto_reload = True
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        Перезагружает таблицу, если XLSX изменился с прошлой загрузки.
+        Возвращает True, если таблица была обновлена.
+        """
+        now = time.monotonic()
+        if not force and self._table is not None and (
+                not self.auto_reload or now - self._checked < self.check_interval):
+            return False
+        async with self._lock:
+            self._checked = time.monotonic()
+            try:
+                signature = file_signature(self.path)
+                if not force and self._table is not None and signature == self._signature:
+                    return False
+                table = await asyncio.to_thread(load_indexed_table, self.path, self.sidecar_path, self.column)
+            except Exception as e:
+                logger.error(f"Не удалось загрузить реестр вагонов {self.path}: {e}")
+                return False
+            self._replace(table)
+            self._signature = signature
+            logger.info(f"Реестр вагонов загружен: {len(table)} вагонов")
+            return True
+
+    def swap(self, table: WagonTable):
+        """Подменяет таблицу целиком (например, загруженной из GLPI)."""
+        self._replace(table)
+
+    def _replace(self, table):
+        # Вызывается в цикле событий: обработчики читают таблицу без await,
+        # поэтому к этому моменту старой таблицей никто не пользуется
+        previous, self._table = self._table, table
+        if previous is not None and previous is not table:
+            previous.close()
+
+    def lookup(self, serial):
+        """Возвращает строку таблицы для серийного номера или None."""
+        if self._table is None:
+            return None
+        return self._table.get(serial)
+
+    def keys(self) -> frozenset:
+        """Нормализованные номера всех вагонов (пустое множество, если реестр не загружен)."""
+        return self._table.keys() if self._table is not None else frozenset()
+
+    def is_active(self, serial) -> bool:
+        """Найден ли вагон и не выведен ли он из эксплуатации."""
+        if self._table is None:
+            return False
+        key = normalize_serial(serial)
+        return key in self._table.keys() and key not in self._table.inactive()
+
+    def inactive(self) -> frozenset:
+        """Нормализованные номера вагонов, выведенных из эксплуатации."""
+        return self._table.inactive() if self._table is not None else frozenset()
+
+    def by_enterprise(self, enterprise) -> frozenset:
+        """Номера вагонов, приписанных к предприятию."""
+        return self._table.select(ENTERPRISE_COLUMN, enterprise) if self._table is not None else frozenset()
+
+    def attributes(self, serial) -> dict:
+        """Атрибуты вагона для текста заявки (TICKET_ATTRIBUTES): подпись -> значение."""
+        if self._table is None:
+            return {}
+        index = self._table.find(serial)
+        if index is None:
+            return {}
+        attributes = {}
+        for column, label in TICKET_ATTRIBUTES.items():
+            if column in self._table.columns:
+                value = self._table.cell(index, column)
+                if value not in (None, ""):
+                    attributes[label] = value
+        return attributes
+
+    def __contains__(self, serial):
+        return self._table is not None and self._table.find(serial) is not None
+
+    def __len__(self):
+        return len(self._table) if self._table is not None else 0
+
+
+wagon_registry = WagonRegistry()
+
+
+def main(argv):
+    if len(argv) < 1 or argv[0] != "build":
+        print("Использование: python -m utils.wagon_registry build [wagons.xlsx] [wagons.idx]")
+        return 2
+    xlsx_path = argv[1] if len(argv) > 1 else WAGONS_PATH
+    sidecar_path = argv[2] if len(argv) > 2 else SIDECAR_PATH
+    content = compile_table(xlsx_path)
+    with open(sidecar_path, "wb") as f:
+        f.write(content)
+    print(f"{sidecar_path}: {len(WagonTable(content))} вагонов, {len(content)} байт")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
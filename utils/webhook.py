@@ -0,0 +1,142 @@
+# utils/webhook.py
+"""
+Приём обновлений через вебхук (BOT_MODE=webhook) вместо long polling.
+
+Telegram отправляет обновления POST-запросами на WEBHOOK_URL + WEBHOOK_PATH,
+их принимает aiohttp-приложение с обработчиком aiogram (SimpleRequestHandler):
+    — запрос без правильного заголовка X-Telegram-Bot-Api-Secret-Token
+      (WEBHOOK_SECRET) отклоняется с кодом 401;
+    — Telegram получает ответ сразу, обновление обрабатывается в фоне;
+      одновременно обрабатывается не больше WEBHOOK_MAX_CONCURRENCY обновлений;
+    — если обновлений в работе и в ожидании больше WEBHOOK_MAX_PENDING,
+      запрос отклоняется с кодом 503 и Telegram повторит его позже.
+
+Несколько экземпляров бота можно поставить за балансировщик с общим WEBHOOK_URL;
+вебхук в Telegram регистрирует только экземпляр с WEBHOOK_REGISTER=true.
+"""
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """SimpleRequestHandler с ограничением числа одновременно обрабатываемых обновлений."""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token=None,
+                 max_concurrency=32, max_pending=256, close_timeout=10.0, **data):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_pending = max_pending
+        self.close_timeout = close_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+        # Статистика
+        self._accepted = 0
+        self._rejected = 0
+        self._unauthorized = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.bot):
+            self._unauthorized += 1
+            logger.warning(f"Запрос вебхука с неверным секретом от {request.remote}")
+            return web.Response(body="Unauthorized", status=401)
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            return web.Response(body="Busy", status=503, headers={"Retry-After": "1"})
+        # Обновление считается ожидающим с момента приёма, а не с запуска фоновой задачи,
+        # иначе пачка запросов, пришедших одновременно, обошла бы ограничение
+        self._accepted += 1
+        self._pending += 1
+        try:
+            return await super().handle(request)
+        except Exception:
+            self._pending -= 1
+            raise
+
+    __call__ = handle
+
+    async def _background_feed_update(self, bot: Bot, update):
+        try:
+            async with self._semaphore:
+                await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления из вебхука: {e}", exc_info=True)
+        finally:
+            self._pending -= 1
+
+    async def close(self):
+        """Дожидается обновлений в обработке (не дольше `close_timeout` сек) и закрывает сессию бота."""
+        if self._background_feed_update_tasks:
+            await asyncio.wait(set(self._background_feed_update_tasks), timeout=self.close_timeout)
+        await super().close()
+
+    def stats(self) -> dict:
+        """Принятые, отклонённые из-за перегрузки и неавторизованные запросы."""
+        return {
+            "pending": self._pending,
+            "accepted": self._accepted,
+            "rejected": self._rejected,
+            "unauthorized": self._unauthorized,
+        }
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, secret_token=None, path=None,
+                      max_concurrency=None, max_pending=None) -> web.Application:
+    """aiohttp-приложение, принимающее обновления для `dp` по пути `path`."""
+    handler = LimitedRequestHandler(
+        dp,
+        bot,
+        secret_token=secret_token if secret_token is not None else config.WEBHOOK_SECRET,
+        max_concurrency=max_concurrency or config.WEBHOOK_MAX_CONCURRENCY,
+        max_pending=max_pending or config.WEBHOOK_MAX_PENDING,
+    )
+    app = web.Application()
+    app["webhook_handler"] = handler
+    handler.register(app, path=path or config.WEBHOOK_PATH)
+    # Обработчики запуска/остановки диспетчера выполняются вместе с приложением
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def register_webhook(bot: Bot, dp: Dispatcher):
+    """Регистрирует вебхук в Telegram с секретом и типами обновлений, которые обрабатывает бот."""
+    url = config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH
+    await bot.set_webhook(
+        url,
+        secret_token=config.WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+    )
+    logger.info(f"Вебхук зарегистрирован: {url}")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Запускает HTTP-сервер вебхука и работает до отмены."""
+    if not config.WEBHOOK_SECRET:
+        raise RuntimeError("Для BOT_MODE=webhook нужно задать WEBHOOK_SECRET")
+    app = build_webhook_app(dp, bot)
+    if config.WEBHOOK_REGISTER:
+        if not config.WEBHOOK_URL:
+            raise RuntimeError("Для регистрации вебхука нужно задать WEBHOOK_URL")
+
+        async def on_app_startup(_):
+            await register_webhook(bot, dp)
+
+        app.on_startup.append(on_app_startup)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Вебхук слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        logger.info(f"Статистика вебхука: {app['webhook_handler'].stats()}")
+        await runner.cleanup()
@@ -0,0 +1,294 @@
+# utils/workers.py
+"""
+Многопроцессный режим (BOT_WORKERS > 1): обновления распределяются по чатам
+между процессами-обработчиками.
+
+    основной процесс            получает обновления (long polling или вебхук,
+                                см. BOT_MODE) и отправляет каждое в очередь
+                                процесса chat_id % BOT_WORKERS;
+    процессы-обработчики        у каждого свой Bot и Dispatcher с обычными
+                                роутерами (main.build_dispatcher), свой пул GLPI
+                                и справочные данные.
+
+Все обновления одного чата попадают в один процесс и обрабатываются в нём по
+очереди, поэтому порядок шагов диалога (FSM) сохраняется, а разные чаты
+обрабатываются параллельно на разных ядрах. Основной процесс раз в секунду
+проверяет обработчики и перезапускает упавшие. Перезапущенный процесс получает
+новую очередь (упавший мог оставить занятой блокировку чтения старой), поэтому
+обновления, не прочитанные упавшим процессом, теряются.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue as queue_module
+import secrets
+import signal
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Метка остановки в очереди обработчика
+STOP = None
+# Пауза перед перезапуском процесса, который падает сразу после старта, сек
+RESTART_BACKOFF = (1, 2, 5, 10, 30)
+
+
+def update_chat_id(update: dict):
+    """id чата обновления (или пользователя, если чата нет), None для обновлений без них."""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+    return None
+
+
+def shard_of(update: dict, workers: int) -> int:
+    """Номер процесса-обработчика для обновления."""
+    chat_id = update_chat_id(update)
+    return chat_id % workers if chat_id is not None else update["update_id"] % workers
+
+
+# === Процесс-обработчик ===
+
+def worker_main(index: int, queue):
+    """Точка входа процесса-обработчика."""
+    # Ctrl+C получает вся группа процессов: обработчик останавливает основной процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # main.py при импорте в дочернем процессе уже настроил логирование: заменяем формат
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(levelname)s:%(name)s:%(message)s",
+                        force=True)
+    asyncio.run(_serve(index, queue))
+
+
+def _next_update(queue):
+    """Следующее сообщение очереди; STOP, если основной процесс завершился без остановки обработчиков."""
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            parent = multiprocessing.parent_process()
+            if parent is not None and not parent.is_alive():
+                return STOP
+
+
+async def _serve(index, queue):
+    from aiogram import Bot
+    from aiogram.methods import TelegramMethod
+    from aiogram.types import Update
+
+    import main
+
+    bot = Bot(token=config.BOT_TOKEN)
+    dp = main.build_dispatcher()
+    await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot])
+    logger.info(f"Обработчик {index} запущен")
+
+    # chat_id -> [замок, число обновлений чата в работе]: обновления одного чата
+    # обрабатываются по очереди (asyncio.Lock отдаётся ожидающим в порядке очереди)
+    locks = {}
+    tasks = set()
+
+    async def process(chat_id, raw):
+        entry = locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                update = Update.model_validate(raw, context={"bot": bot})
+                response = await dp.feed_update(bot, update)
+                if isinstance(response, TelegramMethod):
+                    await dp.silent_call_request(bot, response)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {raw.get('update_id')}: {e}", exc_info=True)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del locks[chat_id]
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            message = await loop.run_in_executor(None, _next_update, queue)
+            if message is STOP:
+                break
+            raw = json.loads(message)
+            task = asyncio.create_task(process(update_chat_id(raw), raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        if tasks:
+            await asyncio.wait(set(tasks), timeout=10)
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot])
+        await bot.session.close()
+        logger.info(f"Обработчик {index} остановлен")
+
+
+# === Основной процесс ===
+
+class WorkerPool:
+    """Процессы-обработчики с очередями обновлений и перезапуском упавших."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue() for _ in range(workers)]
+        self._processes = [None] * workers
+        self._started_at = [0.0] * workers
+        self._failures = [0] * workers
+        # Статистика
+        self._routed = [0] * workers
+        self._restarts = 0
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=worker_main, args=(index, self._queues[index]), name=f"bot-worker-{index}", daemon=False,
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Запущено обработчиков: {self.workers}")
+
+    def route(self, update: dict):
+        """Отправляет обновление (dict из JSON Bot API) обработчику его чата."""
+        index = shard_of(update, self.workers)
+        self._queues[index].put(json.dumps(update, ensure_ascii=False))
+        self._routed[index] += 1
+
+    async def supervise(self, interval=1.0):
+        """Перезапускает упавшие обработчики (с паузой, если процесс падает сразу после старта)."""
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    if now - self._started_at[index] > RESTART_BACKOFF[-1]:
+                        self._failures[index] = 0
+                    continue
+                delay = RESTART_BACKOFF[min(self._failures[index], len(RESTART_BACKOFF) - 1)]
+                if now - self._started_at[index] < delay:
+                    continue
+                logger.error(f"Обработчик {index} завершился с кодом {process.exitcode}, перезапуск")
+                self._failures[index] += 1
+                self._restarts += 1
+                # Упавший процесс мог остаться владельцем блокировки чтения очереди
+                lost = self._queues[index]
+                lost.close()
+                lost.cancel_join_thread()
+                self._queues[index] = self._context.Queue()
+                self._spawn(index)
+
+    async def stop(self, timeout=15.0):
+        """Останавливает обработчики: они дообрабатывают очередь и выполняют shutdown."""
+        for queue in self._queues:
+            queue.put(STOP)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Обработчик {process.name} не остановился за {timeout} сек")
+                process.terminate()
+        logger.info(f"Статистика обработчиков: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {"routed": list(self._routed), "restarts": self._restarts}
+
+
+async def _poll(bot, pool, allowed_updates, polling_timeout=30):
+    """Long polling без диспетчера: сырые обновления сразу уходят в обработчики."""
+    from aiogram.methods import GetUpdates
+    from aiogram.utils.backoff import Backoff, BackoffConfig
+
+    backoff = Backoff(config=BackoffConfig(min_delay=1.0, max_delay=5.0, factor=1.3, jitter=0.1))
+    offset = None
+    while True:
+        try:
+            updates = await bot(
+                GetUpdates(offset=offset, timeout=polling_timeout, allowed_updates=allowed_updates),
+                request_timeout=polling_timeout + bot.session.timeout,
+            )
+        except Exception as e:
+            logger.error(f"Ошибка получения обновлений: {e}")
+            await backoff.asleep()
+            continue
+        backoff.reset()
+        for update in updates:
+            pool.route(update.model_dump(mode="json", exclude_unset=True, by_alias=True))
+            offset = update.update_id + 1
+
+
+def _webhook_app(pool):
+    """aiohttp-приложение вебхука, которое только проверяет секрет и раздаёт обновления."""
+    from aiohttp import web
+
+    async def handle(request):
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(token, config.WEBHOOK_SECRET):
+            return web.Response(body="Unauthorized", status=401)
+        pool.route(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(config.WEBHOOK_PATH, handle)
+    return app
+
+
+async def run_sharded(bot, workers: int):
+    """Основной процесс многопроцессного режима: приём обновлений и надзор за обработчиками."""
+    import main
+    from utils.webhook import register_webhook
+
+    # Диспетчер основного процесса нужен только для списка используемых типов обновлений
+    dp = main.build_dispatcher()
+    allowed_updates = dp.resolve_used_update_types()
+    await dp.storage.close()
+
+    # Остановка по Ctrl+C и SIGTERM: обработчики дообрабатывают свои очереди
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    pool = WorkerPool(workers)
+    pool.start()
+    supervisor = asyncio.create_task(pool.supervise())
+    poller = None
+    runner = None
+    try:
+        if config.BOT_MODE == "webhook":
+            from aiohttp import web
+
+            if not config.WEBHOOK_SECRET:
+                raise RuntimeError("Для BOT_MODE=webhook нужно задать WEBHOOK_SECRET")
+            runner = web.AppRunner(_webhook_app(pool))
+            await runner.setup()
+            await web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT).start()
+            if config.WEBHOOK_REGISTER:
+                if not config.WEBHOOK_URL:
+                    raise RuntimeError("Для регистрации вебхука нужно задать WEBHOOK_URL")
+                await register_webhook(bot, dp)
+            logger.info(f"Вебхук слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+        else:
+            poller = asyncio.create_task(_poll(bot, pool, allowed_updates))
+        await stopping.wait()
+        logger.info("Остановка обработчиков")
+    finally:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signum)
+        supervisor.cancel()
+        if poller is not None:
+            poller.cancel()
+        if runner is not None:
+            await runner.cleanup()
+        await pool.stop()
+        await bot.session.close()